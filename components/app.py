@@ -1,6 +1,8 @@
 import pyray as pr
-import json
 import os
+import queue
+import threading
+import time
 from .main_config import *
 from .knob import Knob
 from .button import Button
@@ -8,9 +10,15 @@ from .panel import Panel
 from .input_box import Input
 from .colors import *
 from .vu import VUMeter
+from .waterfall import Waterfall
+from .stats_overlay import StatsOverlay
+from .retained import unload_targets
+from radconf import ConfigStore
 
 try:
     from radlive import LiveFMPlayer
+    from radasync import AsyncRTLTCPFacade
+    from radscan import BandScanner, dongle_key
 except ImportError:
     LiveFMPlayer = None
     print("LiveFMPlayer not available")
@@ -37,9 +45,17 @@ class App:
         self.rx_player = None
         self.tx_player = None
         self.selected_filepath = None
+        self.scanning = False
+        self.scan_results = queue.Queue()
+        self.scan_resume = False
+        self.focused = None
         
         if LiveFMPlayer:
-            self.rx_player = LiveFMPlayer(self.config['host'], self.config['port'])
+            # asyncio client so retunes from the ui never wait on the socket
+            self.rx_player = LiveFMPlayer(self.config['host'], self.config['port'],
+                                          AsyncRTLTCPFacade(self.config['host'], self.config['port']))
+            # the dsp never computes spectra faster than we show them
+            self.rx_player.enable_spectrum(WATERFALL_BINS, VU_FPS)
 
         if not self.is_pi or not self.is_root_user:
             print("WARNING: TX mode requires a Raspberry Pi and root privileges. TX will be disabled.")
@@ -75,16 +91,25 @@ class App:
     def init_ui_elements(self):
         if self.mode == "RX":
             self.freq_knob = Knob(WINDOW_WIDTH - 100, WINDOW_HEIGHT // 2 - 20, 60, self.mode, self.config['frequency'], self.set_frequency)
+            self.freq_knob.stations = self.station_list()
             self.panel = Panel(160, self.mode)
+            self.panel.labels = [("SETTINGS", 20, 20, 16, 'fg'), ("Host:", 20, 38, 12, 'dim'), ("Port:", 20, 78, 12, 'dim')]
             self.menu_btn = Button(20, 10, 60, 25, "CFG", self.panel.toggle, self.mode)
             self.connect_btn = Button(20, WINDOW_HEIGHT - 100, 100, 30, "Connect", self.toggle_connect, self.mode)
+            self.scan_btn = Button(20, 150, 120, 30, "SCANNING" if self.scanning else "SCAN", self.start_scan, self.mode)
             self.vu_meter = VUMeter(20, WINDOW_HEIGHT - 50, 200, 20)
+            self.stats_overlay = StatsOverlay(180, 8)
+            self.stats_overlay.visible = self.config.get('show_stats', False)
+            if not hasattr(self, 'waterfall'):
+                # kept across mode switches, it owns gpu textures
+                self.waterfall = Waterfall(20, 105, WATERFALL_BINS, 24, 80)
             # rx settings
             self.host_input = Input(20, 50, 120, self.config.get('host', DEFAULT_HOST), self.mode, self.set_host, True)
             self.port_input = Input(20, 90, 120, str(self.config.get('port', DEFAULT_PORT)), self.mode, self.set_port, True)
         else:  # TX mode
             self.freq_knob = Knob(WINDOW_WIDTH - 100, WINDOW_HEIGHT // 2 - 20, 60, self.mode, self.config['frequency'], self.set_frequency)
             self.panel = Panel(160, self.mode)
+            self.panel.labels = [("SETTINGS", 20, 20, 16, 'fg'), ("Name:", 20, 38, 12, 'dim'), ("Description:", 20, 78, 12, 'dim')]
             self.menu_btn = Button(20, 10, 60, 25, "CFG", self.panel.toggle, self.mode)
             self.connect_btn = Button(20, WINDOW_HEIGHT - 100, 100, 30, "Send", self.toggle_send, self.mode)
             self.file_btn = Button(130, WINDOW_HEIGHT - 100, 120, 30, "Select File", self.select_file, self.mode)
@@ -95,7 +120,6 @@ class App:
         self.apply_btn = Button(20, 200, 120, 30, "APPLY", self.apply_settings)
 
     def load_config(self):
-        cfg_file = "config.json"
         default_config = {
             'host': DEFAULT_HOST,
             'port': DEFAULT_PORT,
@@ -103,36 +127,21 @@ class App:
             'name': DEFAULT_NAME,
             'description': DEFAULT_DESC
         }
-        
-        if os.path.exists(cfg_file):
-            try:
-                with open(cfg_file, 'r') as f:
-                    loaded_config = json.load(f)
-                    config = {**default_config, **loaded_config}
-                    return config
-            except (json.JSONDecodeError, FileNotFoundError):
-                print("Config file corrupted, using defaults")
-                return default_config
-        else:
-            self.save_config_to_file(default_config)
-            return default_config
+        # changes are written in the background once they settle, not on every knob frame
+        return ConfigStore(CONFIG_FILE, default_config, CONFIG_SAVE_DELAY).load()
 
     def save_config_to_file(self, config=None):
-        if config is None:
-            config = self.config
-            
-        try:
-            with open("config.json", 'w') as f:
-                json.dump(config, f, indent=4)
-            print("Configuration saved successfully")
-        except Exception as e:
-            print(f"Failed to save config: {e}")
+        if config is not None:
+            self.config.update(config)
+        self.config.save()
 
     def update_config(self, key, value):
         self.config[key] = value
-        self.save_config_to_file()
 
     def switch_mode(self):
+        if self.scanning:
+            print("Wait for the scan to finish")
+            return
         if self.mode == "RX" and self.rx_player:
             if hasattr(self.rx_player, 'rtl') and self.rx_player.rtl.connected:
                 self.rx_player.stop()
@@ -193,7 +202,10 @@ class App:
         if not self.rx_player:
             print("RX Player not available")
             return
-            
+        if self.scanning:
+            print("Wait for the scan to finish")
+            return
+
         if self.rx_player.rtl.connected:
             self.rx_player.stop()
             self.rx_player.disconnect()
@@ -203,6 +215,58 @@ class App:
                 self.rx_player.start()
                 self.connect_btn.text = "Disconnect"
 
+    def station_list(self, key=None):
+        # before connecting the tuner is unknown, any scan from this host:port will do
+        stations = self.config.get('stations', {})
+        if key is None:
+            prefix = f"{self.config['host']}:{self.config['port']}/"
+            key = next((k for k in stations if k.startswith(prefix)), None)
+        return [freq for freq, _ in stations.get(key, {}).get('stations', [])]
+
+    def start_scan(self):
+        if not self.rx_player or not self.rx_player.rtl.connected:
+            print("Connect before scanning")
+            return
+        if self.scanning:
+            return
+        player = self.rx_player
+        # the scanner owns the socket until finish_scan, stopped and restarted from the ui thread
+        self.scan_resume = player.running
+        player.stop()
+        key = dongle_key(player.rtl)
+        # work on a copy, the ui thread may save the config meanwhile
+        old = self.config.get('stations', {}).get(key, {})
+        cache = {'hops': dict(old.get('hops', {}))}
+        gain = None if player.config['use_hardware_agc'] else player.config['gain']
+        self.scanning = True
+        self.scan_btn.text = "SCANNING"
+        threading.Thread(target=self.scan_band, args=(key, cache, gain), daemon=True).start()
+
+    def scan_band(self, key, cache, gain):
+        # scan thread: only talks to the dongle, the result goes back through scan_results
+        stations = None
+        try:
+            stations = BandScanner(self.rx_player.rtl, gain=gain).scan(cache)
+        finally:
+            self.scan_results.put((key, cache, stations))
+
+    def finish_scan(self):
+        # ui thread, returns True when a scan just ended
+        try:
+            key, cache, stations = self.scan_results.get_nowait()
+        except queue.Empty:
+            return False
+        self.scanning = False
+        if stations is not None:
+            self.config['stations'] = {**self.config.get('stations', {}), key: cache}
+        if self.scan_resume:
+            self.rx_player.start()
+        if self.mode == "RX":
+            if stations is not None:
+                self.freq_knob.stations = self.station_list(key)
+            self.scan_btn.text = "SCAN"
+        return True
+
     def set_name(self, value):
         self.config['name'] = value
         print(f"Name updated to: {value}")
@@ -262,6 +326,9 @@ class App:
         self.update_config('frequency', value)
 
     def apply_settings(self):
+        if self.scanning:
+            print("Wait for the scan to finish")
+            return
         if self.mode == "RX" and self.rx_player:
             if hasattr(self.rx_player, 'rtl') and self.rx_player.rtl.connected:
                 self.rx_player.initialize_sdr()
@@ -277,6 +344,7 @@ class App:
         if self.mode == "RX":
             self.host_input.x = base_x
             self.port_input.x = base_x
+            self.scan_btn.x = base_x
         else:
             self.name_input.x = base_x
             self.desc_input.x = base_x
@@ -290,10 +358,48 @@ class App:
         return mouse_pos.x > panel_right
 
 
+    def toggle_stats(self):
+        self.stats_overlay.visible = not self.stats_overlay.visible
+        self.update_config('show_stats', self.stats_overlay.visible)
+
+    def is_streaming(self):
+        return bool(self.mode == "RX" and self.rx_player and self.rx_player.running)
+
+    def is_live(self):
+        # something can change on screen without any input
+        if self.scanning or self.is_streaming():
+            return True
+        return bool(self.mode == "TX" and self.tx_player and self.tx_player.get_status()["is_playing"])
+
+    def screen_state(self):
+        # everything drawn that is not owned by a widget
+        if self.mode == "RX":
+            status = self.rx_player.rtl.connected if self.rx_player else None
+        else:
+            status = self.tx_player.get_status() if self.tx_player else None
+            status = status and (status["is_playing"], status["current_file"])
+        return (self.mode, status, self.connect_btn.text, self.freq_knob.value,
+                getattr(self, 'scan_btn', None) and self.scan_btn.text)
+
+    def wait_for_change(self):
+        # nothing to draw: no swap, just keep input flowing
+        if self.is_live():
+            # short fixed waits so input is never late, redraws stay gated by dirty and the vu timer
+            pr.wait_time(1 / FPS)
+            pr.poll_input_events()
+        else:
+            # fully idle, block until the next input event
+            pr.enable_event_waiting()
+            pr.poll_input_events()
+            pr.disable_event_waiting()
+
     def run(self):
         pr.init_window(WINDOW_WIDTH, WINDOW_HEIGHT, "TinySDR - Unified")
         pr.set_target_fps(FPS)
 
+        dirty = True
+        last_state = None
+        next_vu = 0.0
         while not pr.window_should_close():
             
             if pr.is_mouse_button_pressed(pr.MOUSE_LEFT_BUTTON) and not self.is_swiping:
@@ -302,26 +408,55 @@ class App:
                     self.panel.toggle()
 
             self.handle_swipe_input()
+            dirty |= self.finish_scan()
+            if self.mode == "RX" and pr.is_key_pressed(pr.KEY_F3):
+                self.toggle_stats()
+                dirty = True
+            dirty |= pr.is_mouse_button_pressed(pr.MOUSE_LEFT_BUTTON) or pr.is_mouse_button_released(pr.MOUSE_LEFT_BUTTON)
+            # a resized or refocused window may have lost its last frame
+            focused = pr.is_window_focused()
+            dirty |= pr.is_window_resized() or focused != self.focused
+            self.focused = focused
             
-            self.freq_knob.update()
-            self.connect_btn.update()
-            self.menu_btn.update()
-            self.panel.update()
+            dirty |= self.freq_knob.update()
+            dirty |= self.connect_btn.update()
+            dirty |= self.menu_btn.update()
+            dirty |= self.panel.update()
             self.update_panel_widgets()
 
             if self.panel.open:
                 if self.mode == "RX":
-                    self.host_input.update()
-                    self.port_input.update()
+                    dirty |= self.host_input.update()
+                    dirty |= self.port_input.update()
+                    dirty |= self.scan_btn.update()
                 else:
-                    self.name_input.update()
-                    self.desc_input.update()
-                self.apply_btn.update()
+                    dirty |= self.name_input.update()
+                    dirty |= self.desc_input.update()
+                dirty |= self.apply_btn.update()
 
             if self.mode == "RX" and hasattr(self, 'vu_meter') and self.rx_player:
-                self.vu_meter.set_level(self.rx_player.rms_level)
+                # the meter gets its own, lower refresh rate
+                now = time.monotonic()
+                if now >= next_vu:
+                    next_vu = now + 1 / VU_FPS
+                    dirty |= self.vu_meter.set_level(self.rx_player.rms_level)
+                    # only snapshot the counters when they are shown
+                    stats = self.rx_player.get_stats() if self.stats_overlay.visible and self.rx_player.running else None
+                    dirty |= self.stats_overlay.update(stats)
+                marker = None
+                if self.rx_player.running:
+                    marker = 0.5 + self.rx_player.tuning_offset / self.rx_player.config['sdr_sample_rate']
+                dirty |= self.waterfall.update(self.rx_player.spectrum, marker)
             elif self.mode == "TX" and hasattr(self, 'file_btn'):
-                self.file_btn.update()
+                dirty |= self.file_btn.update()
+
+            state = self.screen_state()
+            dirty |= state != last_state
+            last_state = state
+            if not dirty:
+                self.wait_for_change()
+                continue
+            dirty = False
 
             # Drawing
             pr.begin_drawing()
@@ -345,8 +480,10 @@ class App:
             self.menu_btn.draw()
 
             if self.mode == "RX" and hasattr(self, 'vu_meter'):
+                self.waterfall.draw()
                 self.vu_meter.draw()
                 pr.draw_text("VU", 230, WINDOW_HEIGHT - 45, 14, colors['fg'])
+                self.stats_overlay.draw()
             elif self.mode == "TX":
                 if hasattr(self, 'file_btn'):
                     self.file_btn.draw()
@@ -368,18 +505,13 @@ class App:
             # pnl
             self.panel.draw()
             if self.panel.x > -self.panel.w + 10:
-                panel_x = int(self.panel.x)
-                pr.draw_text("SETTINGS", panel_x + 20, 20, 16, colors['fg'])
-
+                # title and labels are part of the panel's cached chrome
                 if self.mode == "RX":
-                    pr.draw_text("Host:", panel_x + 20, 38, 12, colors['dim'])
                     self.host_input.draw()
-                    pr.draw_text("Port:", panel_x + 20, 78, 12, colors['dim'])
                     self.port_input.draw()
+                    self.scan_btn.draw()
                 else:
-                    pr.draw_text("Name:", panel_x + 20, 38, 12, colors['dim'])
                     self.name_input.draw()
-                    pr.draw_text("Description:", panel_x + 20, 78, 12, colors['dim'])
                     self.desc_input.draw()
                 
                 self.apply_btn.draw()
@@ -387,7 +519,7 @@ class App:
             pr.end_drawing()
 
         # Cleanup
-        self.save_config_to_file()
+        self.config.close()
         
         if self.rx_player:
             self.rx_player.stop()
@@ -396,5 +528,8 @@ class App:
         if self.tx_player:
             self.tx_player.stop()
             self.tx_player.cleanup()
-        
+
+        if hasattr(self, 'waterfall'):
+            self.waterfall.unload()
+        unload_targets()
         pr.close_window()
\ No newline at end of file
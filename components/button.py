@@ -19,9 +19,14 @@ class Button:
         pr.draw_text(self.text.encode(), tx, ty, 16, self.colors["fg"])
 
     def update(self):
+        # returns True when the button needs a redraw
         mouse = pr.get_mouse_position()
-        self.hover = (self.x <= mouse.x <= self.x + self.w and 
-                      self.y <= mouse.y <= self.y + self.h)
+        hover = (self.x <= mouse.x <= self.x + self.w and 
+                 self.y <= mouse.y <= self.y + self.h)
+        changed = hover != self.hover
+        self.hover = hover
         
         if pr.is_mouse_button_pressed(pr.MOUSE_LEFT_BUTTON) and self.hover:
             self.callback()
+            return True
+        return changed
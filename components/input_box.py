@@ -23,6 +23,8 @@ class Input:
         self.blink += 1
 
     def update(self):
+        # returns True while focused (cursor blink, typing) or on losing focus
+        was_active = self.active
         mouse = pr.get_mouse_position()
         if pr.is_mouse_button_pressed(pr.MOUSE_LEFT_BUTTON):
             self.active = (self.x <= mouse.x <= self.x + self.w and 
@@ -53,4 +55,6 @@ class Input:
                 if self.realtime and value_changed:
                     self.callback(self.value)
                 elif not self.realtime and pr.is_key_pressed(pr.KEY_ENTER):
-                    self.callback(self.value)
\ No newline at end of file
+                    self.callback(self.value)
+
+        return self.active or was_active
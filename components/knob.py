@@ -1,6 +1,7 @@
 import pyray as pr
 import math
 from .colors import *
+from .retained import cached_target, draw_target
 
 class Knob:
     def __init__(self, x, y, r, mode, value=100.0, callback=None):
@@ -10,6 +11,7 @@ class Knob:
         self.dragging = False
         self.min_freq = 88.0
         self.max_freq = 108.0
+        self.stations = []  # MHz, from the last band scan
 
         value_normalized = (self.value - self.min_freq) / (self.max_freq - self.min_freq)  # 0..1
         self.angle = (value_normalized - 0.5) * 2 * math.pi
@@ -17,9 +19,11 @@ class Knob:
         self.colors = get_current_colors(mode)
 
     def draw(self):
-        pr.draw_circle(self.x, self.y, self.r, self.colors["accent"])
-
-        self.draw_frequency_scale()
+        # body, scale and station marks only change with the colors or a new scan
+        half = self.r + 35
+        key = ('knob', self.r, self.colors["accent"], self.colors["dim"], tuple(self.stations))
+        target = cached_target(key, 2 * half, 2 * half, lambda: self.draw_static(half, half))
+        draw_target(target, self.x - half, self.y - half)
 
         # indicator
         dx = math.cos(self.angle)
@@ -36,7 +40,12 @@ class Knob:
                         3,
                         self.colors["bg"])
 
-    def draw_frequency_scale(self):
+    def draw_static(self, cx, cy):
+        pr.draw_circle(cx, cy, self.r, self.colors["accent"])
+        self.draw_frequency_scale(cx, cy)
+        self.draw_stations(cx, cy)
+
+    def draw_frequency_scale(self, cx, cy):
 
         frequencies = [92, 96, 100, 104, 108]
         
@@ -46,8 +55,8 @@ class Knob:
             mark_angle = (freq_normalized - 0.5) * 2 * math.pi
             
             text_radius = self.r + 15
-            text_x = self.x + int(math.cos(mark_angle) * text_radius)
-            text_y = self.y + int(math.sin(mark_angle) * text_radius)
+            text_x = cx + int(math.cos(mark_angle) * text_radius)
+            text_y = cy + int(math.sin(mark_angle) * text_radius)
             
             freq_text = f"{freq}"
             text_width = pr.measure_text(freq_text.encode(), 13)
@@ -57,6 +66,15 @@ class Knob:
             
             pr.draw_text(freq_text.encode(), text_x, text_y, 13, self.colors["accent"])
 
+    def draw_stations(self, cx, cy):
+        for freq in self.stations:
+            if not self.min_freq <= freq <= self.max_freq:
+                continue
+            angle = ((freq - self.min_freq) / (self.max_freq - self.min_freq) - 0.5) * 2 * math.pi
+            x = cx + int(math.cos(angle) * (self.r - 6))
+            y = cy + int(math.sin(angle) * (self.r - 6))
+            pr.draw_circle(x, y, 2, self.colors["dim"])
+
     def update(self):
         mouse = pr.get_mouse_position()
         dx = mouse.x - self.x
@@ -74,4 +92,5 @@ class Knob:
             freq = 98 + (self.angle / math.pi) * 10
             self.value = max(self.min_freq, min(self.max_freq, freq))
             if self.callback:
-                self.callback(self.value)
\ No newline at end of file
+                self.callback(self.value)
+        return self.dragging
\ No newline at end of file
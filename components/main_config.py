@@ -1,6 +1,11 @@
 WINDOW_WIDTH = 480
 WINDOW_HEIGHT = 320
-FPS = 60
+FPS = 60  # while something moves on screen, also the input poll rate while live
+VU_FPS = 20  # vu meter and waterfall refresh while streaming
+WATERFALL_BINS = 256
+
+CONFIG_FILE = "config.json"
+CONFIG_SAVE_DELAY = 1.0  # seconds of quiet before config.json is rewritten
 
 # rx defaults
 DEFAULT_HOST = "127.0.0.1"
@@ -1,6 +1,7 @@
 import pyray as pr
 from .colors import *
 from .main_config import WINDOW_HEIGHT
+from .retained import cached_target, draw_target
 
 class Panel:
     def __init__(self, w, mode):
@@ -9,17 +10,29 @@ class Panel:
         self.target = -w
         self.open = False
         self.colors = get_current_colors(mode)
+        self.labels = []  # (text, x, y, size, color name), part of the static chrome
 
     def toggle(self):
         self.open = not self.open
         self.target = 0 if self.open else -self.w
 
     def update(self):
+        # returns True while sliding
+        if self.x == self.target:
+            return False
         self.x += (self.target - self.x) * 0.2
         if abs(self.x - self.target) < 1:
             self.x = self.target
+        return True
+
+    def draw_chrome(self):
+        pr.draw_rectangle(0, 0, self.w, WINDOW_HEIGHT, self.colors["bg"])
+        pr.draw_line(self.w, 0, self.w, WINDOW_HEIGHT, self.colors["dim"])
+        for text, x, y, size, color in self.labels:
+            pr.draw_text(text.encode(), x, y, size, self.colors[color])
 
     def draw(self):
-        x = int(self.x)
-        pr.draw_rectangle(x, 0, self.w, WINDOW_HEIGHT, self.colors["bg"])
-        pr.draw_line(x + self.w, 0, x + self.w, WINDOW_HEIGHT, self.colors["dim"])
+        if self.x <= -self.w:
+            return
+        key = ('panel', self.w, self.colors["bg"], self.colors["dim"], tuple(self.labels))
+        draw_target(cached_target(key, self.w + 1, WINDOW_HEIGHT, self.draw_chrome), int(self.x), 0)
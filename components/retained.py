@@ -0,0 +1,33 @@
+import pyray as pr
+
+# static parts of widgets, painted once per key and blitted every frame after that.
+# one texture per widget kind (the key's first item), a new key replaces and unloads the old one
+_targets = {}
+
+
+def cached_target(key, w, h, paint):
+    slot = key[0]
+    cached = _targets.get(slot)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if cached is not None:
+        pr.unload_render_texture(cached[1])
+    target = pr.load_render_texture(w, h)
+    pr.begin_texture_mode(target)
+    pr.clear_background(pr.BLANK)
+    paint()
+    pr.end_texture_mode()
+    _targets[slot] = (key, target)
+    return target
+
+
+def draw_target(target, x, y):
+    texture = target.texture
+    # render textures come out upside down, a negative source height flips them back
+    pr.draw_texture_rec(texture, pr.Rectangle(0, 0, texture.width, -texture.height), pr.Vector2(x, y), pr.WHITE)
+
+
+def unload_targets():
+    for _, target in _targets.values():
+        pr.unload_render_texture(target)
+    _targets.clear()
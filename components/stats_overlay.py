@@ -0,0 +1,48 @@
+import pyray as pr
+from .colors import RX_FG
+
+OVERLAY_BG = (0, 0, 0, 180)
+# short labels so a line fits next to the knob
+DSP_LABELS = (('ch', 'channelize'), ('fm', 'demodulate'), ('rs', 'resample'), ('pa', 'process_audio'))
+
+
+def format_stats(stats):
+    stages = stats['stages']
+    lines = [f"IN {stats['input_rate'] / 1e6:.3f}/{stats['configured_rate'] / 1e6:.3f} MS/s"
+             f"  read p99 {stages['read']['p99_ms']:.0f} ms"]
+    lines.append("DSP p99 " + " ".join(f"{label} {stages[name]['p99_ms']:.1f}" for label, name in DSP_LABELS) + " ms")
+    audio = stats.get('audio')
+    if audio:
+        callback = stages.get('audio_callback', {}).get('p99_ms', 0.0)
+        lines.append(f"AUD {audio['fill'] * 1e3:.0f}/{audio['target'] * 1e3:.0f} ms"
+                     f"  under {audio['underruns']} over {audio['overruns']}  cb {callback:.1f} ms")
+    queue = stats.get('iq_queue')
+    if queue:
+        lines.append(f"IQ {queue['fill']}/{queue['depth']}  dropped {queue['dropped']}  stale {stats['stale_blocks']}")
+    return lines
+
+
+class StatsOverlay:
+    # pipeline counters from LiveFMPlayer.get_stats, off unless toggled
+    def __init__(self, x, y, font_size=10):
+        self.x = x
+        self.y = y
+        self.font_size = font_size
+        self.visible = False
+        self.lines = []
+
+    def update(self, stats):
+        # returns True if the text changed
+        lines = format_stats(stats) if self.visible and stats else []
+        changed = lines != self.lines
+        self.lines = lines
+        return changed
+
+    def draw(self):
+        if not self.lines:
+            return
+        line_h = self.font_size + 2
+        width = max(pr.measure_text(line.encode(), self.font_size) for line in self.lines) + 8
+        pr.draw_rectangle(self.x, self.y, width, line_h * len(self.lines) + 4, OVERLAY_BG)
+        for i, line in enumerate(self.lines):
+            pr.draw_text(line.encode(), self.x + 4, self.y + 3 + i * line_h, self.font_size, RX_FG)
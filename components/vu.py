@@ -1,5 +1,6 @@
 import pyray as pr
 from .colors import RX_DIM # as vu is only into rx we dont need to get_current_colors
+from .retained import cached_target
 
 class VUMeter:
     def __init__(self, x, y, w, h):
@@ -10,15 +11,25 @@ class VUMeter:
         self.level = 0.0  # 0.0 -> 1.0
 
     def set_level(self, value):
+        # returns True if the lit width changed
+        before = int(self.w * self.level)
         self.level = max(0.0, min(1.0, value))
+        return int(self.w * self.level) != before
 
-    def draw(self):
-        pr.draw_rectangle_lines(self.x, self.y, self.w, self.h, RX_DIM)
-
-        for i in range(int(self.w * self.level)):
+    def draw_gradient(self):
+        for i in range(self.w):
             t = i / self.w  # 0.0 -> 1.0
             r = int(255 * t)
             g = int(255 * (1 - t))
             b = 0
-            pr.draw_rectangle(self.x + i, self.y, 1, self.h, (r, g, b, 255))
+            pr.draw_rectangle(i, 0, 1, self.h, (r, g, b, 255))
+
+    def draw(self):
+        pr.draw_rectangle_lines(self.x, self.y, self.w, self.h, RX_DIM)
+
+        # the full gradient is painted once, each frame shows the lit part of it
+        width = int(self.w * self.level)
+        if width:
+            gradient = cached_target(('vu', self.w, self.h), self.w, self.h, self.draw_gradient).texture
+            pr.draw_texture_rec(gradient, pr.Rectangle(0, 0, width, -self.h), pr.Vector2(self.x, self.y), pr.WHITE)
 
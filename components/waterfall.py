@@ -0,0 +1,107 @@
+import pyray as pr
+from .colors import RX_BG, RX_FG, RX_DIM, RX_ACCENT
+
+# dark -> rx background red -> orange -> rx foreground -> white
+PALETTE_STOPS = (
+    (0.0, (0, 0, 0)),
+    (0.3, RX_BG[:3]),
+    (0.6, (230, 120, 40)),
+    (0.85, RX_FG[:3]),
+    (1.0, (255, 255, 255)),
+)
+
+try:
+    import numpy as np
+except ImportError:
+    # the gui still starts without the radio modules, only pushed spectra need numpy
+    np = None
+
+
+def make_palette():
+    levels = np.linspace(0, 1, 256)
+    stops = [s for s, _ in PALETTE_STOPS]
+    palette = np.full((256, 4), 255, dtype=np.uint8)
+    for channel in range(3):
+        palette[:, channel] = np.interp(levels, stops, [c[channel] for _, c in PALETTE_STOPS])
+    return palette
+
+
+class Waterfall:
+    # both the trace and the waterfall live in textures, a frame only uploads pixels and blits
+    def __init__(self, x, y, bins, trace_h, rows, dynamic_range=50.0):
+        self.x, self.y = x, y
+        self.bins = bins
+        self.trace_h = trace_h
+        self.rows = rows
+        self.dynamic_range = dynamic_range
+        self.trace_texture = None
+        self.texture = None
+        self.head = 0
+        self.floor = None
+        self.seen = 0
+        self.marker = None  # 0..1 across the capture
+
+    def load(self):
+        self.palette = make_palette()
+        self.trace_pixels = np.zeros((self.trace_h, self.bins, 4), dtype=np.uint8)
+        self.trace_color = np.array(RX_ACCENT, dtype=np.uint8)
+        self.heights = np.arange(self.trace_h, 0, -1)[:, None]
+        self.row = np.zeros((self.bins, 4), dtype=np.uint8)
+        image = pr.gen_image_color(self.bins, self.rows, pr.BLACK)
+        self.texture = pr.load_texture_from_image(image)
+        pr.unload_image(image)
+        image = pr.gen_image_color(self.bins, self.trace_h, RX_BG)
+        self.trace_texture = pr.load_texture_from_image(image)
+        pr.unload_image(image)
+
+    def unload(self):
+        if self.texture:
+            pr.unload_texture(self.texture)
+            pr.unload_texture(self.trace_texture)
+            self.texture = None
+            self.trace_texture = None
+
+    def push(self, power_db):
+        if self.texture is None:
+            self.load()
+        # the floor follows the noise slowly so the colors don't pump with every frame
+        median = float(np.median(power_db))
+        self.floor = median if self.floor is None else self.floor + 0.05 * (median - self.floor)
+        level = np.clip((power_db - self.floor + 5) / self.dynamic_range, 0, 1)
+
+        # newest row goes just above the previous one, drawing starts at head
+        self.head = (self.head - 1) % self.rows
+        self.row[:] = self.palette[(level * 255).astype(np.uint8)]
+        pr.update_texture_rec(self.texture, pr.Rectangle(0, self.head, self.bins, 1), pr.ffi.from_buffer(self.row))
+
+        filled = self.heights <= (level * self.trace_h)[None, :]
+        self.trace_pixels[:] = RX_BG
+        self.trace_pixels[filled] = self.trace_color
+        pr.update_texture(self.trace_texture, pr.ffi.from_buffer(self.trace_pixels))
+
+    def update(self, tap, marker=None):
+        # returns True when there is something new to show
+        moved = marker != self.marker
+        self.marker = marker
+        if tap is None or tap.seq == self.seen or tap.latest is None:
+            return moved
+        self.seen = tap.seq
+        self.push(tap.latest)
+        return True
+
+    def draw(self):
+        pr.draw_rectangle_lines(self.x - 1, self.y - 1, self.bins + 2, self.trace_h + self.rows + 3, RX_DIM)
+        if self.texture is None:
+            return
+        pr.draw_texture(self.trace_texture, self.x, self.y, pr.WHITE)
+        top = self.y + self.trace_h + 1
+        # the ring of rows is drawn in two pieces, head first
+        first = self.rows - self.head
+        pr.draw_texture_rec(self.texture, pr.Rectangle(0, self.head, self.bins, first),
+                            pr.Vector2(self.x, top), pr.WHITE)
+        if self.head:
+            pr.draw_texture_rec(self.texture, pr.Rectangle(0, 0, self.bins, self.head),
+                                pr.Vector2(self.x, top + first), pr.WHITE)
+        if self.marker is not None and 0 <= self.marker <= 1:
+            mx = self.x + int(self.marker * (self.bins - 1))
+            pr.draw_line(mx, self.y, mx, self.y + self.trace_h, RX_FG)
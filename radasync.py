@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+RadAsync - asyncio RTL-TCP client for RadLive
+IQ is read on an event loop, so commands never wait behind a blocking recv
+"""
+import asyncio
+import socket
+import threading
+import numpy as np
+
+from radlive import (
+    Log, RTLTCPClient, pack_command, parse_dongle_info, iq_from_bytes,
+    DONGLE_INFO_SIZE, DEFAULT_BUFFER_SIZE, DEFAULT_RING_SIZE
+)
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 5
+
+
+class AsyncRTLTCPClient:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.socket = None
+        self.connected = False
+        self.dongle_info = None
+        self.commands = None
+        self.writer_task = None
+
+    async def connect(self, timeout=CONNECT_TIMEOUT):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (self.host, self.port)), timeout)
+            self.socket = sock
+            header = bytearray(DONGLE_INFO_SIZE)
+            if not await asyncio.wait_for(self.recv_into(header), timeout):
+                raise ConnectionError("connection closed before dongle info")
+            self.dongle_info = parse_dongle_info(header)
+        except Exception as e:
+            Log.error(f"Connection failed: {e}")
+            sock.close()
+            self.socket = None
+            return False
+        self.commands = asyncio.Queue()
+        self.writer_task = loop.create_task(self.write_loop())
+        self.connected = True
+        return True
+
+    async def recv_into(self, buffer):
+        loop = asyncio.get_running_loop()
+        view = memoryview(buffer)
+        got = 0
+        while got < len(view):
+            n = await loop.sock_recv_into(self.socket, view[got:got + DEFAULT_BUFFER_SIZE])
+            if n == 0:
+                return False
+            got += n
+        return True
+
+    async def stream(self, num_samples, ring_size=DEFAULT_RING_SIZE):
+        # yields views into a small ring, same lifetime rules as RTLTCPClient.read_samples
+        raw = [np.empty(num_samples * 2, dtype=np.uint8) for _ in range(ring_size)]
+        iq = [np.empty(num_samples, dtype=np.complex64) for _ in range(ring_size)]
+        index = np.empty(num_samples, dtype=np.intp)
+        slot = 0
+        while self.connected:
+            if not await self.recv_into(raw[slot]):
+                return
+            yield iq_from_bytes(raw[slot], out=iq[slot], index=index)
+            slot = (slot + 1) % ring_size
+
+    async def drain(self):
+        # socket is non blocking, take what is already there and no more
+        scratch = bytearray(DEFAULT_BUFFER_SIZE)
+        dropped = 0
+        while True:
+            try:
+                n = self.socket.recv_into(scratch)
+            except (BlockingIOError, InterruptedError):
+                break
+            if n == 0:
+                break
+            dropped += n
+        if dropped % 2 and await self.recv_into(memoryview(scratch)[:1]):
+            dropped += 1
+        return dropped // 2
+
+    def send_command(self, command, value):
+        # must be called on the loop thread, only queues the bytes
+        if not self.connected:
+            Log.warning("Cannot send command, not connected")
+            return False
+        self.commands.put_nowait(pack_command(command, value))
+        return True
+
+    async def send(self, data):
+        await asyncio.get_running_loop().sock_sendall(self.socket, data)
+
+    async def write_loop(self):
+        while True:
+            data = await self.commands.get()
+            try:
+                await self.send(data)
+            except OSError as e:
+                # the socket is gone, later commands warn instead of queueing for nobody
+                self.connected = False
+                Log.error(f"Command failed, connection lost: {e}")
+                return
+
+    async def disconnect(self):
+        self.connected = False
+        if self.writer_task:
+            self.writer_task.cancel()
+            self.writer_task = None
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+
+class AsyncRTLTCPFacade(RTLTCPClient):
+    # blocking RTLTCPClient api over an AsyncRTLTCPClient running on its own loop thread
+    def __init__(self, host, port, ring_size=DEFAULT_RING_SIZE):
+        super().__init__(host, port, ring_size)
+        self.client = None
+        self.loop = None
+        self.loop_thread = None
+
+    def ensure_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.loop_thread.start()
+
+    def run(self, coro, timeout):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def connect(self):
+        self.ensure_loop()
+        self.client = AsyncRTLTCPClient(self.host, self.port)
+        try:
+            if not self.run(self.client.connect(), CONNECT_TIMEOUT + 1):
+                return False
+        except Exception as e:
+            Log.error(f"Connection failed: {e}")
+            return False
+        self.dongle_info = self.client.dongle_info
+        self.connected = True
+        self.commands.start()
+        self.log_connected()
+        return True
+
+    def write_commands(self, data):
+        # called from the scheduler thread, the ui never touches the socket
+        try:
+            self.run(self.client.send(data), READ_TIMEOUT)
+        except OSError:
+            self.connected = self.client.connected = False
+            raise
+
+    def drain(self):
+        if not self.connected:
+            return 0
+        try:
+            return self.run(self.client.drain(), READ_TIMEOUT)
+        except Exception as e:
+            Log.error(f"Drain failed: {e}")
+            return 0
+
+    def recv_exact(self, buffer):
+        return self.run(asyncio.wait_for(self.client.recv_into(buffer), READ_TIMEOUT), READ_TIMEOUT + 1)
+
+    def disconnect(self):
+        self.commands.stop()
+        if self.client:
+            try:
+                self.run(self.client.disconnect(), 1)
+            except Exception:
+                pass
+            self.client = None
+            self.connected = False
+            Log.info("Disconnected from RTL-TCP")
+        if self.loop:
+            # a new loop thread is started on the next connect
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=1)
+            self.loop.close()
+            self.loop = None
+            self.loop_thread = None
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+RadBench - DSP throughput benchmark for RadLive
+Times every RX stage on a deterministic synthetic FM signal, no dongle needed
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+
+from radlive import (
+    Log, DecimationChain, FMDemodulator, AudioPostProcessor, iq_from_bytes,
+    DEFAULT_AUDIO_RATE, DEFAULT_BLOCK_SIZE, DEFAULT_DEEMPHASIS, MAX_DEVIATION
+)
+
+DEFAULT_TONES = ((400, 0.4), (1000, 0.3), (3000, 0.2), (9000, 0.1))
+BENCH_RATES = (1.024e6, 2.048e6, 2.4e6)
+
+
+class SyntheticFMSource:
+    # deterministic fm transmitter, phase and noise carry over between reads
+    def __init__(self, sample_rate=1.024e6, tones=DEFAULT_TONES, deviation=MAX_DEVIATION,
+                 carrier_offset=0.0, snr_db=30.0, amplitude=0.8, seed=0):
+        self.sample_rate = sample_rate
+        self.tones = tones
+        self.deviation = deviation
+        self.carrier_offset = carrier_offset
+        self.snr_db = snr_db
+        self.amplitude = amplitude
+        self.rng = np.random.default_rng(seed)
+        self.sample = 0
+        self.phase = 0.0
+        self.peak = sum(level for _, level in tones) or 1.0
+
+    def audio(self, t):
+        audio = np.zeros(len(t))
+        for freq, level in self.tones:
+            audio += level * np.sin(2 * np.pi * freq * t)
+        return audio / self.peak
+
+    def read_iq(self, num_samples):
+        t = (self.sample + np.arange(num_samples)) / self.sample_rate
+        inst_freq = self.carrier_offset + self.deviation * self.audio(t)
+        phase = self.phase + np.cumsum(2 * np.pi * inst_freq / self.sample_rate)
+        self.phase = phase[-1] % (2 * np.pi)
+        self.sample += num_samples
+        iq = self.amplitude * np.exp(1j * phase)
+        if self.snr_db is not None:
+            sigma = self.amplitude / np.sqrt(2) * 10 ** (-self.snr_db / 20)
+            iq += sigma * (self.rng.standard_normal(num_samples) + 1j * self.rng.standard_normal(num_samples))
+        return iq
+
+    def read_bytes(self, num_samples):
+        return iq_to_bytes(self.read_iq(num_samples))
+
+
+def iq_to_bytes(iq):
+    # rtl_tcp style interleaved unsigned 8 bit IQ
+    raw = np.empty(len(iq) * 2, dtype=np.uint8)
+    raw[0::2] = np.clip(np.round(iq.real * 127.5 + 127.5), 0, 255)
+    raw[1::2] = np.clip(np.round(iq.imag * 127.5 + 127.5), 0, 255)
+    return raw
+
+
+def synth_fm_iq(num_samples, sample_rate=1.024e6, **kwargs):
+    return SyntheticFMSource(sample_rate, **kwargs).read_bytes(num_samples)
+
+
+class StageBench:
+    def __init__(self, name):
+        self.name = name
+        self.times = []
+        self.alloc = []
+
+    def run(self, func, *args):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = func(*args)
+        self.times.append(time.perf_counter() - start)
+        self.alloc.append(tracemalloc.get_traced_memory()[1] - base)
+        return result
+
+    def report(self, samples, sample_rate):
+        per_block = float(np.median(self.times))
+        return {
+            'stage': self.name,
+            'ms_per_block': per_block * 1e3,
+            'msps': samples / per_block / 1e6,
+            'realtime': samples / sample_rate / per_block,
+            'alloc_kib': float(np.median(self.alloc)) / 1024,
+        }
+
+
+def bench_rate(sample_rate, blocks, block_size, audio_rate=DEFAULT_AUDIO_RATE):
+    source = SyntheticFMSource(sample_rate)
+    raws = [source.read_bytes(block_size) for _ in range(blocks)]
+    iq = np.empty(block_size, dtype=np.complex64)
+    index = np.empty(block_size, dtype=np.intp)
+
+    chain = DecimationChain(sample_rate, audio_rate)
+    demodulator = FMDemodulator()
+    post = AudioPostProcessor(audio_rate, chain.channel_rate, DEFAULT_DEEMPHASIS)
+    stages = {name: StageBench(name) for name in ('convert', 'channelize', 'demodulate', 'resample', 'process_audio')}
+
+    # staged pass, each stage timed on its own
+    tracemalloc.start()
+    try:
+        for raw in raws:
+            samples = stages['convert'].run(iq_from_bytes, raw, iq, index)
+            baseband = stages['channelize'].run(chain.channelize, samples)
+            audio = stages['demodulate'].run(demodulator.demodulate, baseband)
+            audio = stages['resample'].run(chain.resample_audio, audio)
+            stages['process_audio'].run(post.process, audio)
+    finally:
+        tracemalloc.stop()
+
+    # whole chain pass on fresh state, without tracemalloc overhead
+    chain.reset()
+    demodulator.reset()
+    post.reset()
+    full = StageBench('full chain')
+    for raw in raws:
+        start = time.perf_counter()
+        post.process(chain.resample_audio(demodulator.demodulate(chain.channelize(iq_from_bytes(raw, iq, index)))))
+        full.times.append(time.perf_counter() - start)
+        full.alloc.append(0)
+
+    rows = [stage.report(block_size, sample_rate) for stage in stages.values()]
+    full_row = full.report(block_size, sample_rate)
+    full_row['alloc_kib'] = sum(row['alloc_kib'] for row in rows)
+    rows.append(full_row)
+    return rows
+
+
+def print_report(sample_rate, rows):
+    print(f"\n{sample_rate / 1e6:.3f} MS/s")
+    print(f"  {'stage':<14}{'ms/block':>10}{'MS/s':>10}{'x realtime':>12}{'alloc KiB/blk':>15}")
+    for row in rows:
+        print(f"  {row['stage']:<14}{row['ms_per_block']:>10.2f}{row['msps']:>10.2f}"
+              f"{row['realtime']:>12.1f}{row['alloc_kib']:>15.1f}")
+
+
+def write_recording(path, seconds, sample_rate, **kwargs):
+    from radrec import IQRecorder
+    source = SyntheticFMSource(sample_rate, **kwargs)
+    recorder = IQRecorder(path, 100e6, sample_rate)
+    if not recorder.start():
+        return False
+    remaining = int(seconds * sample_rate)
+    while remaining > 0:
+        n = min(DEFAULT_BLOCK_SIZE, remaining)
+        recorder.write(source.read_bytes(n))
+        remaining -= n
+    recorder.stop()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RadLive DSP benchmark")
+    parser.add_argument('--rates', type=float, nargs='+', default=[r / 1e6 for r in BENCH_RATES], help="sample rates in MS/s")
+    parser.add_argument('--blocks', type=int, default=50)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--write', metavar='PATH', help="write a synthetic .cu8 recording instead of benchmarking")
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of the --write recording")
+    parser.add_argument('--offset', type=float, default=0.0, help="carrier offset in Hz for --write")
+    parser.add_argument('--snr', type=float, default=30.0, help="snr in dB for --write")
+    args = parser.parse_args()
+
+    if args.write:
+        return 0 if write_recording(args.write, args.seconds, args.rates[0] * 1e6,
+                                    carrier_offset=args.offset, snr_db=args.snr) else 1
+
+    Log.info(f"{args.blocks} blocks of {args.block_size} samples per rate")
+    for rate in args.rates:
+        print_report(rate * 1e6, bench_rate(rate * 1e6, args.blocks, args.block_size))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+RadCast - One dongle, many listeners
+Demodulates once with LiveFMPlayer and fans the audio out over HTTP and raw TCP
+"""
+import argparse
+import json
+import signal
+import socket
+import struct
+import threading
+import time
+from collections import deque
+import numpy as np
+
+from radlive import Log, LiveFMPlayer, DEFAULT_SAMPLE_RATE, DEFAULT_AUDIO_RATE
+from radcli import parse_frequency
+
+DEFAULT_HTTP_PORT = 8000
+DEFAULT_CLIENT_BUFFER = 2.0  # seconds of audio a listener may fall behind before it is dropped
+DEFAULT_MAX_LISTENERS = 64
+
+S16 = 's16'
+ULAW = 'ulaw'
+BYTES_PER_SAMPLE = {S16: 2, ULAW: 1}
+
+
+def encode_s16(audio):
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def encode_ulaw(audio):
+    # g.711 mu-law, vectorized
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int32)
+    sign = (pcm < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(pcm), 32635) + 0x84
+    exponent = np.frexp(magnitude)[1] - 8
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+ENCODERS = {S16: encode_s16, ULAW: encode_ulaw}
+
+
+def wav_header(fmt, sample_rate):
+    # endless stream, sizes are left at their maximum
+    if fmt == ULAW:
+        chunk = struct.pack('<HHIIHHH', 7, 1, sample_rate, sample_rate, 1, 8, 0)
+    else:
+        chunk = struct.pack('<HHIIHH', 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    return (b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+            + b'fmt ' + struct.pack('<I', len(chunk)) + chunk
+            + b'data' + struct.pack('<I', 0xFFFFFFFF))
+
+
+class Listener:
+    def __init__(self, conn, addr, fmt, max_bytes):
+        self.conn = conn
+        self.addr = f"{addr[0]}:{addr[1]}"
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.pending = deque()
+        self.pending_bytes = 0
+        self.sent_bytes = 0
+        self.cond = threading.Condition()
+        self.alive = True
+        self.connected_at = time.time()
+
+    def offer(self, data):
+        # called from the dsp thread, never blocks
+        with self.cond:
+            if not self.alive or self.pending_bytes + len(data) > self.max_bytes:
+                return False
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+            self.cond.notify()
+            return True
+
+    def send_loop(self, on_exit):
+        try:
+            while self.alive:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.pending or not self.alive, timeout=1.0)
+                    if not self.pending:
+                        continue
+                    data = self.pending.popleft()
+                    self.pending_bytes -= len(data)
+                self.conn.sendall(data)
+                self.sent_bytes += len(data)
+        except OSError:
+            pass
+        finally:
+            self.close()
+            on_exit(self)
+
+    def close(self):
+        with self.cond:
+            self.alive = False
+            self.cond.notify()
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class FanoutSink:
+    # takes LiveFMPlayer's audio, encodes each format once and hands it to every listener
+    buffer = None
+
+    def __init__(self, sample_rate=DEFAULT_AUDIO_RATE, client_buffer=DEFAULT_CLIENT_BUFFER,
+                 max_listeners=DEFAULT_MAX_LISTENERS):
+        self.sample_rate = sample_rate
+        self.client_buffer = client_buffer
+        self.max_listeners = max_listeners
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.dropped = 0
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            listeners, self.listeners = self.listeners, []
+        for listener in listeners:
+            listener.close()
+
+    def add(self, conn, addr, fmt, header=b''):
+        max_bytes = int(self.client_buffer * self.sample_rate * BYTES_PER_SAMPLE[fmt]) + len(header)
+        listener = Listener(conn, addr, fmt, max_bytes)
+        with self.lock:
+            if len(self.listeners) >= self.max_listeners:
+                Log.warning(f"Refusing {listener.addr}, {self.max_listeners} listeners already")
+                listener.close()
+                return None
+            self.listeners.append(listener)
+        if header:
+            listener.offer(header)
+        threading.Thread(target=listener.send_loop, args=(self.remove,), daemon=True).start()
+        Log.info(f"Listener {listener.addr} joined ({fmt}), {len(self.listeners)} connected")
+        return listener
+
+    def remove(self, listener):
+        with self.lock:
+            if listener not in self.listeners:
+                return
+            self.listeners.remove(listener)
+        Log.info(f"Listener {listener.addr} left, {len(self.listeners)} connected")
+
+    def play(self, audio_data):
+        if not self.running:
+            return
+        with self.lock:
+            listeners = list(self.listeners)
+        if not listeners:
+            return
+        encoded = {}
+        for listener in listeners:
+            if listener.fmt not in encoded:
+                encoded[listener.fmt] = ENCODERS[listener.fmt](audio_data)
+            if not listener.offer(encoded[listener.fmt]):
+                # slow listener, drop it rather than hold up the dsp
+                self.dropped += 1
+                Log.warning(f"Dropping slow listener {listener.addr}")
+                listener.close()
+
+    def status(self):
+        with self.lock:
+            return {
+                'listeners': [{
+                    'address': l.addr,
+                    'format': l.fmt,
+                    'buffered': l.pending_bytes / BYTES_PER_SAMPLE[l.fmt] / self.sample_rate,
+                    'sent_bytes': l.sent_bytes,
+                    'since': l.connected_at,
+                } for l in self.listeners],
+                'dropped': self.dropped,
+            }
+
+
+class CastServer:
+    def __init__(self, player, sink, host='0.0.0.0', http_port=DEFAULT_HTTP_PORT, raw_port=None):
+        self.player = player
+        self.sink = sink
+        self.host = host
+        self.http_port = http_port
+        self.raw_port = raw_port
+        self.sockets = []
+        self.running = False
+
+    def listen(self, port, handler):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, port))
+        sock.listen(16)
+        self.sockets.append(sock)
+        threading.Thread(target=self.accept_loop, args=(sock, handler), daemon=True).start()
+        return sock.getsockname()[1]
+
+    def start(self):
+        self.running = True
+        try:
+            if self.http_port is not None:
+                self.http_port = self.listen(self.http_port, self.handle_http)
+                Log.success(f"HTTP stream on http://{self.host}:{self.http_port}/ (/ulaw.wav, /raw, /status)")
+            if self.raw_port is not None:
+                self.raw_port = self.listen(self.raw_port, self.handle_raw)
+                Log.success(f"Raw s16 PCM on tcp://{self.host}:{self.raw_port}")
+        except OSError as e:
+            Log.error(f"Failed to listen: {e}")
+            self.stop()
+            return False
+        return True
+
+    def stop(self):
+        self.running = False
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+    def accept_loop(self, sock, handler):
+        while self.running:
+            try:
+                conn, addr = sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=handler, args=(conn, addr), daemon=True).start()
+
+    def handle_raw(self, conn, addr):
+        self.sink.add(conn, addr, S16)
+
+    def handle_http(self, conn, addr):
+        try:
+            conn.settimeout(5)
+            request = b''
+            while b'\r\n\r\n' not in request and len(request) < 8192:
+                chunk = conn.recv(1024)
+                if not chunk:
+                    conn.close()
+                    return
+                request += chunk
+            conn.settimeout(None)
+            parts = request.split(b'\r\n', 1)[0].split()
+            path = parts[1].decode(errors='replace') if len(parts) > 1 else '/'
+        except OSError:
+            conn.close()
+            return
+
+        rate = self.sink.sample_rate
+        if path in ('/', '/stream.wav'):
+            self.sink.add(conn, addr, S16, self.http_head('audio/wav') + wav_header(S16, rate))
+        elif path == '/ulaw.wav':
+            self.sink.add(conn, addr, ULAW, self.http_head('audio/wav') + wav_header(ULAW, rate))
+        elif path == '/raw':
+            self.sink.add(conn, addr, S16, self.http_head('application/octet-stream'))
+        elif path == '/status':
+            body = json.dumps({
+                'frequency': self.player.config['frequency'],
+                'sample_rate': rate,
+                **self.sink.status(),
+            }).encode()
+            self.reply(conn, '200 OK', 'application/json', body)
+        else:
+            self.reply(conn, '404 Not Found', 'text/plain', b'not found\n')
+
+    def http_head(self, content_type):
+        return (f"HTTP/1.0 200 OK\r\nContent-Type: {content_type}\r\n"
+                "Cache-Control: no-cache\r\nConnection: close\r\n\r\n").encode()
+
+    def reply(self, conn, status, content_type, body):
+        try:
+            conn.sendall(f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        except OSError:
+            pass
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan one rtl_tcp dongle out to many listeners")
+    parser.add_argument('-f', '--frequency', type=parse_frequency, default=95.0, help="MHz, or with a k/M/G suffix")
+    parser.add_argument('-g', '--gain', type=float, help="manual gain in dB, hardware AGC when omitted")
+    parser.add_argument('-s', '--rate', type=float, default=DEFAULT_SAMPLE_RATE, help="SDR sample rate in S/s")
+    parser.add_argument('-H', '--host', default='127.0.0.1', help="rtl_tcp host")
+    parser.add_argument('-P', '--port', type=int, default=1234, help="rtl_tcp port")
+    parser.add_argument('--bind', default='0.0.0.0')
+    parser.add_argument('--http', type=int, default=DEFAULT_HTTP_PORT, help="http port, 0 picks one")
+    parser.add_argument('--raw-port', type=int, help="also serve raw s16 pcm on this tcp port")
+    parser.add_argument('--client-buffer', type=float, default=DEFAULT_CLIENT_BUFFER, help="seconds before a slow listener is dropped")
+    parser.add_argument('--max-listeners', type=int, default=DEFAULT_MAX_LISTENERS)
+    args = parser.parse_args()
+
+    player = LiveFMPlayer(args.host, args.port)
+    player.config.update({
+        'sdr_sample_rate': args.rate,
+        'gain': args.gain if args.gain is not None else 0.0,
+        'use_hardware_agc': args.gain is None,
+    })
+    player.set_frequency(args.frequency)
+    sink = FanoutSink(player.config['audio_rate'], args.client_buffer, args.max_listeners)
+    player.audio_player = sink
+
+    server = CastServer(player, sink, args.bind, args.http, args.raw_port)
+    if not server.start():
+        return 1
+    if not player.connect() or not player.start():
+        server.stop()
+        return 1
+    Log.info(f"Tuned to {args.frequency:.3f} MHz")
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    try:
+        while not stop:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        player.stop()
+        player.disconnect()
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+RadChan - Wideband multi-station receiver
+Splits one capture into several FM channels with an FFT overlap-save filterbank
+"""
+import argparse
+import signal
+import time
+from functools import lru_cache
+import numpy as np
+from scipy import fft
+from numpy.lib.stride_tricks import sliding_window_view
+
+from radlive import (
+    Log, LiveFMPlayer, FMDemodulator, AudioPostProcessor, DecimationChain,
+    make_audio_resampler, design_lowpass, CHANNEL_BANDWIDTH, THREAD_BACKEND, DEFAULT_AUDIO_RATE
+)
+from radcli import parse_frequency, make_sink, PCM_FORMATS
+
+DEFAULT_WIDE_RATE = 2.4e6
+FFT_OVERLAP_FACTOR = 8  # fft size vs filter length, higher wastes less of each fft
+
+
+@lru_cache(maxsize=None)
+def design_filterbank(sample_rate, decimation):
+    # one prototype lowpass shared by every channel, overlap rounded to whole output samples
+    channel_rate = sample_rate / decimation
+    transition = channel_rate - 2 * CHANNEL_BANDWIDTH
+    numtaps = int(4 * sample_rate / transition) | 1
+    overlap = -(-(numtaps - 1) // decimation) * decimation
+    bins = 1 << int(np.ceil(np.log2(FFT_OVERLAP_FACTOR * overlap / decimation)))
+    fft_size = bins * decimation
+    taps = np.zeros(fft_size, dtype=np.float32)
+    taps[:numtaps] = design_lowpass(numtaps, CHANNEL_BANDWIDTH, sample_rate)
+    response = fft.fft(taps).astype(np.complex64)
+    return fft_size, overlap, response
+
+
+class Channelizer:
+    # fft overlap-save filterbank: one forward fft per frame for the whole band,
+    # then each channel only picks its bins and runs a short inverse fft at the channel rate
+    def __init__(self, sample_rate, offsets, decimation):
+        self.sample_rate = int(sample_rate)
+        self.decimation = decimation
+        self.channel_rate = self.sample_rate // decimation
+        self.fft_size, self.overlap, response = design_filterbank(self.sample_rate, decimation)
+        self.step = self.fft_size - self.overlap
+        self.bins = self.fft_size // decimation
+        self.bin_width = self.sample_rate / self.fft_size
+
+        # baseband bins in fft order, e.g. 0..M/2-1 then -M/2..-1
+        relative = fft.ifftshift(np.arange(-self.bins // 2, self.bins // 2))
+        self.weights = response[relative % self.fft_size] / decimation
+        self.shifts = []
+        self.indices = []
+        for offset in offsets:
+            shift = int(round(offset / self.bin_width))
+            if abs(shift * self.bin_width) + self.channel_rate / 2 > self.sample_rate / 2:
+                raise ValueError(f"offset {offset / 1e3:.0f} kHz is outside the captured band")
+            self.shifts.append(shift)
+            self.indices.append((relative + shift) % self.fft_size)
+        self.offsets = [shift * self.bin_width for shift in self.shifts]
+        self.frame_index = np.arange(1 << 10, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.pending = np.zeros(self.overlap, dtype=np.complex64)
+        # frames since start, mod fft size, for the mixer phase of each channel
+        self.frame = 0
+
+    def process(self, samples):
+        data = np.concatenate((self.pending, samples.astype(np.complex64, copy=False)))
+        frames = (len(data) - self.overlap) // self.step
+        if frames <= 0:
+            self.pending = data
+            return [np.empty(0, dtype=np.complex64) for _ in self.shifts]
+
+        segments = sliding_window_view(data, self.fft_size)[::self.step][:frames]
+        spectrum = fft.fft(segments, axis=-1)
+        keep = self.overlap // self.decimation
+
+        if frames > len(self.frame_index):
+            self.frame_index = np.arange(frames, dtype=np.int64)
+        frame = self.frame + self.frame_index[:frames]
+        outputs = []
+        for shift, index in zip(self.shifts, self.indices):
+            baseband = fft.ifft(spectrum[:, index] * self.weights, axis=-1)[:, keep:]
+            # each fft restarts the mixer at its own first sample, line the frames back up
+            turns = (frame * (shift * self.step % self.fft_size)) % self.fft_size
+            baseband *= np.exp(-2j * np.pi * turns / self.fft_size).astype(np.complex64)[:, None]
+            outputs.append(baseband.astype(np.complex64, copy=False).ravel())
+
+        self.frame = (self.frame + frames) % self.fft_size
+        self.pending = data[frames * self.step:].copy()
+        return outputs
+
+
+class Station:
+    def __init__(self, frequency, channel_rate, audio_rate, deemphasis, sink):
+        self.frequency = frequency
+        self.sink = sink
+        self.demodulator = FMDemodulator()
+        self.audio_filter = make_audio_resampler(channel_rate, audio_rate)
+        self.post = AudioPostProcessor(audio_rate, channel_rate, deemphasis)
+
+    def reset(self):
+        self.demodulator.reset()
+        self.audio_filter.reset()
+        self.post.reset()
+
+
+class StationSinks:
+    # lets LiveFMPlayer start and stop every station's sink as one audio player
+    buffer = None
+
+    def __init__(self, stations):
+        self.stations = stations
+
+    def start(self):
+        started = []
+        for station in self.stations:
+            if not station.sink.start():
+                for other in started:
+                    other.sink.stop()
+                return False
+            started.append(station)
+        return True
+
+    def stop(self):
+        for station in self.stations:
+            station.sink.stop()
+
+
+class MultiStationPlayer(LiveFMPlayer):
+    # same reader/dsp threads as LiveFMPlayer, the dsp thread feeds every station from one capture
+    def __init__(self, host='127.0.0.1', port=1234, rtl=None):
+        super().__init__(host, port, rtl)
+        self.config['sdr_sample_rate'] = DEFAULT_WIDE_RATE
+        self.stations = []
+        self.channelizer = None
+        self.audio_player = StationSinks(self.stations)
+        self.levels = []
+
+    def add_station(self, freq_mhz, sink):
+        self.stations.append((int(freq_mhz * 1e6), sink))
+
+    def start(self):
+        if self.running or not self.stations:
+            return False
+        rate = self.config['sdr_sample_rate']
+        audio_rate = self.config['audio_rate']
+        decimation = DecimationChain.pick_channel_decimation(int(rate), audio_rate)
+        offsets = [freq - self.config['frequency'] for freq, _ in self.stations]
+        try:
+            self.channelizer = Channelizer(rate, offsets, decimation)
+        except ValueError as e:
+            Log.error(f"Cannot receive all stations: {e}")
+            return False
+        stations = [Station(freq, self.channelizer.channel_rate, audio_rate, self.config['deemphasis'], sink)
+                    for freq, sink in self.stations]
+        self.audio_player = StationSinks(stations)
+        self.levels = [0.0] * len(stations)
+        self.config['dsp_backend'] = THREAD_BACKEND
+        for station, offset in zip(stations, self.channelizer.offsets):
+            Log.info(f"{station.frequency / 1e6:.3f} MHz at {offset / 1e3:+.1f} kHz")
+        return super().start()
+
+    def build_dsp(self):
+        # the channelizer and stations from start() replace the single station chain
+        self.channelizer.reset()
+
+    def flush_dsp(self):
+        self.channelizer.reset()
+        for station in self.audio_player.stations:
+            station.reset()
+
+    def retune(self, freq_hz):
+        # the channel grid is laid out around the capture center when the player starts
+        Log.warning("Stations are fixed while receiving, stop to move the capture")
+        self.config['frequency'] = self.center_frequency
+        return False
+
+    def process_block(self, samples):
+        # same stages as LiveFMPlayer.process_block, each timed across all stations
+        stations = self.audio_player.stations
+        stages = self.stages
+        start = time.perf_counter()
+        basebands = self.channelizer.process(samples)
+        now = time.perf_counter()
+        stages['channelize'].record(now - start, len(samples), sum(map(len, basebands)))
+        start = now
+        audio = [station.demodulator.demodulate(baseband) for station, baseband in zip(stations, basebands)]
+        now = time.perf_counter()
+        stages['demodulate'].record(now - start, sum(map(len, basebands)), sum(map(len, audio)))
+        start = now
+        resampled = [station.audio_filter.process(a) if len(a) > 0 else a for station, a in zip(stations, audio)]
+        now = time.perf_counter()
+        stages['resample'].record(now - start, sum(map(len, audio)), sum(map(len, resampled)))
+        start = now
+        outputs = [station.post.process(r) if len(r) > 0 else r for station, r in zip(stations, resampled)]
+        stages['process_audio'].record(time.perf_counter() - start, sum(map(len, resampled)), sum(map(len, outputs)))
+        for index, station in enumerate(stations):
+            self.levels[index] = station.post.level
+        self.rms_level = max(self.levels, default=0.0)
+        return outputs
+
+    def play_audio(self, outputs):
+        for station, audio in zip(self.audio_player.stations, outputs):
+            if len(audio) > 0:
+                station.sink.play(audio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive several FM stations from one rtl_tcp capture")
+    parser.add_argument('stations', type=parse_frequency, nargs='+', help="station frequencies in MHz")
+    parser.add_argument('-c', '--center', type=parse_frequency, help="capture center, defaults to the middle of the stations")
+    parser.add_argument('-g', '--gain', type=float, help="manual gain in dB, hardware AGC when omitted")
+    parser.add_argument('-s', '--rate', type=float, default=DEFAULT_WIDE_RATE, help="SDR sample rate in S/s")
+    parser.add_argument('-r', '--audio-rate', type=int, default=DEFAULT_AUDIO_RATE)
+    parser.add_argument('-H', '--host', default='127.0.0.1')
+    parser.add_argument('-P', '--port', type=int, default=1234)
+    parser.add_argument('-o', '--output', default='station_{freq}.wav', help="per station output, {freq} is replaced by the frequency")
+    parser.add_argument('-F', '--format', choices=PCM_FORMATS, default='s16', help="raw pcm sample format")
+    parser.add_argument('--input', help="use a .cu8 recording instead of connecting")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    if '{freq}' not in args.output and len(args.stations) > 1:
+        parser.error("--output needs a {freq} placeholder for more than one station")
+    if args.output == 'audio' or args.output == '-':
+        parser.error("each station needs its own output file")
+
+    rtl = None
+    if args.input:
+        from radrec import IQFileSource
+        rtl = IQFileSource(args.input)
+        args.rate = rtl.sample_rate
+        if args.center is None:
+            args.center = rtl.frequency / 1e6
+    center = args.center if args.center is not None else (min(args.stations) + max(args.stations)) / 2
+
+    player = MultiStationPlayer(args.host, args.port, rtl)
+    player.config.update({
+        'sdr_sample_rate': args.rate,
+        'audio_rate': args.audio_rate,
+        'gain': args.gain if args.gain is not None else 0.0,
+        'use_hardware_agc': args.gain is None,
+    })
+    player.set_frequency(center)
+    for freq in args.stations:
+        player.add_station(freq, make_sink(args.output.replace('{freq}', f"{freq:.1f}"), args.format, args.audio_rate))
+
+    if not player.connect():
+        return 1
+    if not player.start():
+        player.disconnect()
+        return 1
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    started = time.monotonic()
+    try:
+        while not stop:
+            time.sleep(0.1)
+            if args.duration and time.monotonic() - started >= args.duration:
+                break
+            if getattr(player.rtl, 'eof', False) and not player.pending_blocks():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        player.stop()
+        player.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+RadCLI - Headless FM receiver, rtl_fm style
+Runs LiveFMPlayer without the raylib GUI, audio goes to PortAudio, stdout or a wav file
+"""
+import argparse
+import signal
+import sys
+import time
+import wave
+
+from radlive import (
+    Log, LiveFMPlayer, AudioPlayer, DEFAULT_SAMPLE_RATE, DEFAULT_AUDIO_RATE,
+    DROP_OLDEST, BLOCK, THREAD_BACKEND, PROCESS_BACKEND
+)
+
+PCM_FORMATS = ('s16', 'f32')
+
+
+def to_pcm(audio, fmt):
+    if fmt == 'f32':
+        return audio.astype('<f4', copy=False).tobytes()
+    return (audio * 32767).astype('<i2').tobytes()
+
+
+class PCMSink:
+    # raw little endian mono pcm to a binary stream
+    buffer = None
+
+    def __init__(self, stream, fmt='s16', close=False):
+        self.stream = stream
+        self.fmt = fmt
+        self.close = close
+        self.running = False
+        self.failed = False
+
+    def start(self):
+        self.running = True
+        return True
+
+    def play(self, audio_data):
+        if not self.running:
+            return
+        try:
+            self.stream.write(to_pcm(audio_data, self.fmt))
+        except (BrokenPipeError, OSError, ValueError) as e:
+            # reader went away (aplay quit, pipe closed)
+            Log.error(f"Output closed: {e}")
+            self.running = False
+            self.failed = True
+
+    def stop(self):
+        self.running = False
+        try:
+            self.stream.flush()
+            if self.close:
+                self.stream.close()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+
+class WavSink:
+    buffer = None
+
+    def __init__(self, path, sample_rate=DEFAULT_AUDIO_RATE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.wav = None
+        self.running = False
+        self.failed = False
+
+    def start(self):
+        try:
+            self.wav = wave.open(self.path, 'wb')
+            self.wav.setnchannels(1)
+            self.wav.setsampwidth(2)
+            self.wav.setframerate(self.sample_rate)
+        except (OSError, wave.Error) as e:
+            Log.error(f"Failed to open {self.path}: {e}")
+            return False
+        self.running = True
+        Log.success(f"Writing audio to {self.path}")
+        return True
+
+    def play(self, audio_data):
+        if not self.running:
+            return
+        try:
+            self.wav.writeframes(to_pcm(audio_data, 's16'))
+        except OSError as e:
+            Log.error(f"Write failed: {e}")
+            self.running = False
+            self.failed = True
+
+    def stop(self):
+        self.running = False
+        if self.wav:
+            # header gets its final length here
+            self.wav.close()
+            self.wav = None
+
+
+def parse_frequency(text):
+    # accepts 95.0, 95.0M, 95000k or 95000000
+    text = text.strip().lower()
+    scale = 1.0
+    if text[-1:] in ('k', 'm', 'g'):
+        scale = {'k': 1e3, 'm': 1e6, 'g': 1e9}[text[-1]]
+        text = text[:-1]
+    value = float(text) * scale
+    return value / 1e6 if value >= 1e4 else value
+
+
+def make_sink(output, fmt, audio_rate):
+    if output == 'audio':
+        return AudioPlayer(audio_rate)
+    if output == '-':
+        return PCMSink(sys.stdout.buffer, fmt)
+    if output.lower().endswith('.wav'):
+        return WavSink(output, audio_rate)
+    return PCMSink(open(output, 'wb'), fmt, close=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless FM receiver for rtl_tcp")
+    parser.add_argument('-f', '--frequency', type=parse_frequency, help="MHz, or with a k/M/G suffix, "
+                        "defaults to 95 or the center of an --input recording")
+    parser.add_argument('-g', '--gain', type=float, help="manual gain in dB, hardware AGC when omitted")
+    parser.add_argument('-s', '--rate', type=float, default=DEFAULT_SAMPLE_RATE, help="SDR sample rate in S/s")
+    parser.add_argument('-r', '--audio-rate', type=int, default=DEFAULT_AUDIO_RATE)
+    parser.add_argument('-p', '--ppm', type=int, default=0, help="frequency correction")
+    parser.add_argument('-H', '--host', default='127.0.0.1')
+    parser.add_argument('-P', '--port', type=int, default=1234)
+    parser.add_argument('-o', '--output', default='audio', help="'audio' (PortAudio), '-' for stdout, a .wav or a raw pcm file")
+    parser.add_argument('-F', '--format', choices=PCM_FORMATS, default='s16', help="raw pcm sample format")
+    parser.add_argument('-d', '--deemphasis', type=float, choices=(0, 50, 75), default=50, help="us, 0 to disable")
+    parser.add_argument('--input', help="replay a .cu8 recording instead of connecting")
+    parser.add_argument('--fast', action='store_true', help="with --input, run as fast as possible")
+    parser.add_argument('--record', help="also record raw IQ to this .cu8 file")
+    parser.add_argument('--backend', choices=(THREAD_BACKEND, PROCESS_BACKEND), default=THREAD_BACKEND)
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args()
+
+    # stdout may carry pcm, keep the log out of it
+    Log.config(silent=args.quiet, stream=sys.stderr)
+
+    rtl = None
+    if args.input:
+        from radrec import IQFileSource
+        rtl = IQFileSource(args.input, realtime=not args.fast)
+        args.rate = rtl.sample_rate
+    # a recording can't be retuned, the capture stays on its own center
+    center = rtl.frequency / 1e6 if rtl and rtl.frequency else None
+    if args.frequency is None:
+        args.frequency = center if center is not None else 95.0
+    player = LiveFMPlayer(args.host, args.port, rtl)
+    player.config.update({
+        'sdr_sample_rate': args.rate,
+        'audio_rate': args.audio_rate,
+        'gain': args.gain if args.gain is not None else 0.0,
+        'use_hardware_agc': args.gain is None,
+        'freq_correction': args.ppm,
+        'deemphasis': args.deemphasis * 1e-6 if args.deemphasis else None,
+        'dsp_backend': args.backend,
+        # offline input must not lose blocks
+        'overflow_policy': BLOCK if args.input else DROP_OLDEST,
+    })
+    # only the nco can move inside a recording, a station outside it would come out as noise
+    span = player.tuning_span()
+    if center is not None and abs(args.frequency - center) * 1e6 > span:
+        Log.error(f"{args.frequency:.3f} MHz is outside the recording, {center:.3f} MHz +/- {span / 1e6:.3f}")
+        return 1
+    player.set_frequency(center if center is not None else args.frequency)
+
+    player.audio_player = make_sink(args.output, args.format, args.audio_rate)
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+
+    if not player.connect():
+        return 1
+    if args.record and not player.start_recording(args.record):
+        player.disconnect()
+        return 1
+    if not player.start():
+        player.disconnect()
+        return 1
+    if center is not None and args.frequency != center:
+        # another station inside the recording, picked out by the nco
+        player.set_frequency(args.frequency)
+
+    Log.info(f"Tuned to {args.frequency:.3f} MHz")
+    started = time.monotonic()
+    try:
+        while not stop:
+            time.sleep(0.1)
+            if args.duration and time.monotonic() - started >= args.duration:
+                break
+            if getattr(player.audio_player, 'failed', False) or not player.running:
+                break
+            # at the end of a recording, wait for the blocks still in the dsp
+            if getattr(player.rtl, 'eof', False) and not player.pending_blocks():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        player.stop()
+        player.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
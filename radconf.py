@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+RadConf - config.json persistence
+Changes are kept in memory and written in the background once they settle, atomically
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections.abc import MutableMapping
+
+DEFAULT_CONFIG_PATH = "config.json"
+DEFAULT_SAVE_DELAY = 1.0  # seconds without changes before the file is written
+
+
+def write_atomic(path, text):
+    # temp file in the same directory then rename, a power cut leaves the old file or the new one
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass  # not every platform lets a directory be fsynced
+
+
+class ConfigStore(MutableMapping):
+    def __init__(self, path=DEFAULT_CONFIG_PATH, defaults=None, delay=DEFAULT_SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self.data = dict(defaults or {})
+        self.cond = threading.Condition()
+        self.version = 0  # bumped on every change
+        self.saved_version = 0
+        self.changed_at = 0.0
+        self.thread = None
+        self.closed = False
+
+    def load(self):
+        if not os.path.exists(self.path):
+            # first run, the defaults get written like any other change
+            if self.data:
+                self.save()
+            return self
+        try:
+            with open(self.path, 'r') as f:
+                loaded = json.load(f)
+            with self.cond:
+                self.data.update(loaded)
+        except (json.JSONDecodeError, OSError) as e:
+            # plain print, the gui loads this even when the radio modules can't import
+            print(f"{self.path} unreadable ({e}), using defaults")
+        return self
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        with self.cond:
+            if key in self.data and self.data[key] == value:
+                return
+            self.data[key] = value
+        self.save()
+
+    def __delitem__(self, key):
+        with self.cond:
+            del self.data[key]
+        self.save()
+
+    def __iter__(self):
+        return iter(list(self.data))
+
+    def __len__(self):
+        return len(self.data)
+
+    def save(self, now=False):
+        # marks the state dirty, the writer thread picks it up after the quiet period
+        with self.cond:
+            self.version += 1
+            self.changed_at = time.monotonic()
+            if self.thread is None and not now and not self.closed:
+                self.thread = threading.Thread(target=self.writer_loop, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        if now:
+            self.flush()
+
+    def snapshot(self):
+        with self.cond:
+            return self.version, json.dumps(self.data, indent=4)
+
+    def flush(self):
+        version, text = self.snapshot()
+        if version == self.saved_version:
+            return True
+        try:
+            write_atomic(self.path, text)
+        except OSError as e:
+            print(f"Failed to save {self.path}: {e}")
+            return False
+        with self.cond:
+            self.saved_version = max(self.saved_version, version)
+        return True
+
+    def writer_loop(self):
+        while True:
+            with self.cond:
+                while not self.closed and self.version == self.saved_version:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                # coalesce: wait until nothing changed for a full delay
+                while not self.closed:
+                    remaining = self.changed_at + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if self.closed:
+                    return
+            self.flush()
+
+    def close(self):
+        # on exit, whatever is pending is written before returning
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        return self.flush()
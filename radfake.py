@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+RadFake - Stand-in rtl_tcp server for RadLive
+Speaks the rtl_tcp protocol over a synthetic band or a recording, and can probe
+time-to-first-audio, retune latency and throughput of LiveFMPlayer against itself
+"""
+import argparse
+import random
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+from radlive import (
+    Log, BlockQueue, LiveFMPlayer, AudioPlayer, DROP_OLDEST,
+    DEFAULT_SAMPLE_RATE, DEFAULT_AUDIO_RATE,
+    RTL_TCP_SET_FREQ, RTL_TCP_SET_SAMPLE_RATE, RTL_TCP_SET_GAIN_MODE, RTL_TCP_SET_GAIN, RTL_TCP_SET_FREQ_CORRECTION
+)
+from radbench import SyntheticFMSource, iq_to_bytes
+
+COMMAND_NAMES = {
+    RTL_TCP_SET_FREQ: 'SET_FREQ',
+    RTL_TCP_SET_SAMPLE_RATE: 'SET_SAMPLE_RATE',
+    RTL_TCP_SET_GAIN_MODE: 'SET_GAIN_MODE',
+    RTL_TCP_SET_GAIN: 'SET_GAIN',
+    RTL_TCP_SET_FREQ_CORRECTION: 'SET_FREQ_CORRECTION',
+}
+
+# frequency -> the single tone that station plays, so the probe can tell them apart
+DEFAULT_STATIONS = {
+    94.0e6: 700,
+    95.0e6: 1000,
+    95.4e6: 1500,
+    100.0e6: 2500,
+    104.3e6: 4000,
+}
+SERVER_BLOCK_SIZE = 16384
+SERVER_QUEUE_DEPTH = 64  # blocks, rtl_tcp drops the oldest past its own limit too
+
+
+class SyntheticBand:
+    def __init__(self, stations=DEFAULT_STATIONS, sample_rate=DEFAULT_SAMPLE_RATE,
+                 center=100.0e6, snr_db=30.0, seed=0):
+        self.sample_rate = sample_rate
+        self.center = center
+        self.noise = 10 ** (-snr_db / 20) / np.sqrt(2) if snr_db is not None else 0.0
+        self.rng = np.random.default_rng(seed)
+        self.stations = {
+            freq: SyntheticFMSource(sample_rate, tones=((tone, 1.0),), snr_db=None, amplitude=0.3, seed=i)
+            for i, (freq, tone) in enumerate(stations.items())
+        }
+        self.tune(center, sample_rate)
+
+    def tune(self, center, sample_rate):
+        self.center = center
+        self.sample_rate = sample_rate
+        for freq, source in self.stations.items():
+            source.carrier_offset = freq - center
+            source.sample_rate = sample_rate
+
+    def read_bytes(self, num_samples):
+        iq = self.noise * (self.rng.standard_normal(num_samples) + 1j * self.rng.standard_normal(num_samples))
+        for source in self.stations.values():
+            if abs(source.carrier_offset) < 0.45 * self.sample_rate:
+                iq += source.read_iq(num_samples)
+            else:
+                source.sample += num_samples
+        return iq_to_bytes(iq)
+
+
+class RecordingBand:
+    # loops a .cu8 recording, tuning has no effect on the content
+    def __init__(self, path):
+        from radrec import IQFileSource
+        self.source = IQFileSource(path, realtime=False, loop=True)
+        if not self.source.connect():
+            raise OSError(f"cannot open {path}")
+        self.sample_rate = self.source.sample_rate
+
+    def tune(self, center, sample_rate):
+        pass
+
+    def read_bytes(self, num_samples):
+        return np.array(self.source.read_raw_view(num_samples))
+
+
+class FakeRTLTCPServer:
+    def __init__(self, host='127.0.0.1', port=1234, band=None, sample_rate=DEFAULT_SAMPLE_RATE,
+                 tuner=5, gain_count=29, jitter=0.0, block_size=SERVER_BLOCK_SIZE):
+        self.host = host
+        self.port = port
+        self.band = band if band is not None else SyntheticBand(sample_rate=sample_rate)
+        self.sample_rate = getattr(self.band, 'sample_rate', sample_rate)
+        self.frequency = 100.0e6
+        self.gain_mode = 0
+        self.gain = 0
+        self.ppm = 0
+        self.tuner = tuner
+        self.gain_count = gain_count
+        self.jitter = jitter
+        self.block_size = block_size
+
+        self.server = None
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.generated = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.started = None
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+        Log.success(f"Fake rtl_tcp listening on {self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.server:
+            self.server.close()
+            self.server = None
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                conn, addr = self.server.accept()
+            except OSError:
+                return
+            Log.info(f"Client connected from {addr[0]}:{addr[1]}")
+            # like rtl_tcp, one client at a time
+            self.serve(conn)
+            Log.info(f"Client disconnected, sent {self.sent_bytes} bytes, dropped {self.dropped} blocks")
+
+    def serve(self, conn):
+        self.started = time.monotonic()
+        self.generated = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.events = []
+        alive = threading.Event()
+        alive.set()
+        queue = BlockQueue(SERVER_QUEUE_DEPTH, DROP_OLDEST)
+        conn.sendall(b'RTL0' + struct.pack('>II', self.tuner, self.gain_count))
+        workers = [
+            threading.Thread(target=self.command_loop, args=(conn, alive), daemon=True),
+            threading.Thread(target=self.generate_loop, args=(queue, alive), daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while alive.is_set() and self.running:
+                block = queue.get(timeout=0.1)
+                if block is None:
+                    continue
+                if self.jitter:
+                    time.sleep(random.uniform(0, self.jitter))
+                conn.sendall(block)
+                self.sent_bytes += len(block)
+        except OSError:
+            pass
+        finally:
+            alive.clear()
+            queue.close()
+            self.dropped = queue.dropped
+            conn.close()
+
+    def generate_loop(self, queue, alive):
+        # paced like the dongle, a slow client makes blocks pile up and get dropped
+        start = time.monotonic()
+        produced = 0.0
+        while alive.is_set():
+            with self.lock:
+                block = self.band.read_bytes(self.block_size)
+                rate = self.sample_rate
+                self.generated += self.block_size
+            produced += self.block_size / rate
+            delay = start + produced - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            queue.put(block.tobytes())
+            self.dropped = queue.dropped
+
+    def command_loop(self, conn, alive):
+        buffer = bytearray(5)
+        while alive.is_set():
+            try:
+                view = memoryview(buffer)
+                got = 0
+                while got < 5:
+                    n = conn.recv_into(view[got:])
+                    if n == 0:
+                        alive.clear()
+                        return
+                    got += n
+            except OSError:
+                alive.clear()
+                return
+            command = buffer[0]
+            fmt = '>i' if command == RTL_TCP_SET_FREQ_CORRECTION else '>I'
+            (value,) = struct.unpack(fmt, bytes(buffer[1:]))
+            self.apply(command, value)
+
+    def apply(self, command, value):
+        with self.lock:
+            if command == RTL_TCP_SET_FREQ:
+                self.frequency = value
+                self.band.tune(self.frequency, self.sample_rate)
+            elif command == RTL_TCP_SET_SAMPLE_RATE:
+                self.sample_rate = value
+                self.band.tune(self.frequency, self.sample_rate)
+            elif command == RTL_TCP_SET_GAIN_MODE:
+                self.gain_mode = value
+            elif command == RTL_TCP_SET_GAIN:
+                self.gain = value
+            elif command == RTL_TCP_SET_FREQ_CORRECTION:
+                self.ppm = value
+            # takes effect with the next generated block
+            event = {
+                'time': time.monotonic(),
+                'command': COMMAND_NAMES.get(command, f'0x{command:02x}'),
+                'value': value,
+                'sample': self.generated,
+            }
+            self.events.append(event)
+        Log.info(f"[{event['time'] - self.started:8.3f}s] {event['command']} {value} at sample {event['sample']}")
+
+
+def dominant_tone(audio, rate):
+    if len(audio) < 64:
+        return 0.0
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    spectrum[:3] = 0
+    return float(np.argmax(spectrum)) * rate / len(audio)
+
+
+class ProbeSink(AudioPlayer):
+    # stands in for the sound card, records when each tone shows up
+    def __init__(self, sample_rate=DEFAULT_AUDIO_RATE, slow=0.0):
+        super().__init__(sample_rate)
+        self.slow = slow
+        self.log = []
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def play(self, audio_data):
+        self.log.append((time.monotonic(), len(audio_data), dominant_tone(audio_data, self.sample_rate)))
+        if self.slow:
+            time.sleep(self.slow)
+
+    def wait_for_tone(self, tone, since, timeout, tolerance=50):
+        deadline = time.monotonic() + timeout
+        seen = 0
+        while time.monotonic() < deadline:
+            for stamp, _, found in self.log[seen:]:
+                if stamp >= since and abs(found - tone) < tolerance:
+                    return stamp - since
+            seen = len(self.log)
+            time.sleep(0.005)
+        return None
+
+
+def probe(server, first=95.0e6, second=100.0e6, seconds=5.0, slow=0.0):
+    stations = server.band.stations if isinstance(server.band, SyntheticBand) else {}
+    tones = {freq: source.tones[0][0] for freq, source in stations.items()}
+    sink = ProbeSink(DEFAULT_AUDIO_RATE, slow)
+    player = LiveFMPlayer(server.host, server.port)
+    player.audio_player = sink
+    player.config['drift_compensation'] = False
+    player.config['sdr_sample_rate'] = server.sample_rate
+    player.set_frequency(first / 1e6)
+
+    results = {}
+    start = time.monotonic()
+    if not player.connect() or not player.start():
+        return None
+    try:
+        if first in tones:
+            results['time_to_first_audio'] = sink.wait_for_tone(tones[first], start, 10)
+        time.sleep(seconds / 2)
+
+        # a station inside the current capture is reached by the nco alone
+        nearby = [freq for freq in tones if freq not in (first, second)
+                  and abs(freq - player.center_frequency) <= player.tuning_span()]
+        if nearby:
+            sent = time.monotonic()
+            player.set_frequency(nearby[0] / 1e6)
+            results['digital_retune_to_audio'] = sink.wait_for_tone(tones[nearby[0]], sent, 10)
+            time.sleep(0.5)
+
+        sent = time.monotonic()
+        player.set_frequency(second / 1e6)
+        if second in tones:
+            results['retune_to_audio'] = sink.wait_for_tone(tones[second], sent, 10)
+        time.sleep(seconds / 2)
+        if first in tones:
+            # old station audio that still came out after the retune
+            old = [n for stamp, n, tone in sink.log if stamp >= sent and abs(tone - tones[first]) < 50]
+            results['old_audio_after_retune'] = sum(old) / DEFAULT_AUDIO_RATE
+
+        window = [(stamp, n) for stamp, n, _ in sink.log if stamp >= start + 1.0]
+        if len(window) > 1:
+            elapsed = window[-1][0] - window[0][0]
+            results['audio_realtime'] = sum(n for _, n in window[1:]) / DEFAULT_AUDIO_RATE / elapsed
+        elapsed = time.monotonic() - server.started
+        results['server_msps'] = server.sent_bytes / 2 / elapsed / 1e6
+        results['server_dropped_blocks'] = server.dropped
+        applied = [e for e in server.events if e['command'] == 'SET_FREQ' and e['time'] >= sent]
+        if applied:
+            results['command_to_server'] = applied[0]['time'] - sent
+    finally:
+        player.stop()
+        player.disconnect()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake rtl_tcp server")
+    parser.add_argument('-a', '--address', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=1234)
+    parser.add_argument('-s', '--rate', type=float, default=DEFAULT_SAMPLE_RATE, help="sample rate in S/s")
+    parser.add_argument('--file', help="serve a .cu8 recording instead of the synthetic band")
+    parser.add_argument('--jitter', type=float, default=0.0, help="max random delay per block in ms")
+    parser.add_argument('--probe', action='store_true', help="run LiveFMPlayer against the server and report latencies")
+    parser.add_argument('--seconds', type=float, default=6.0, help="probe duration")
+    parser.add_argument('--slow', type=float, default=0.0, help="probe consumer delay per audio block in ms")
+    args = parser.parse_args()
+
+    band = RecordingBand(args.file) if args.file else SyntheticBand(sample_rate=args.rate)
+    server = FakeRTLTCPServer(args.address, 0 if args.probe else args.port, band, args.rate,
+                              jitter=args.jitter / 1000)
+    server.start()
+    try:
+        if args.probe:
+            results = probe(server, seconds=args.seconds, slow=args.slow / 1000)
+            if results is None:
+                Log.error("Probe failed to start")
+                return 1
+            for key, value in results.items():
+                text = f"{value:.3f}" if isinstance(value, float) else str(value)
+                Log.print(f"{key:<24}{text}", 'bright_white')
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
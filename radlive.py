@@ -9,15 +9,44 @@ import numpy as np
 import threading
 import time
 from scipy import signal
-from scipy.signal import resample_poly
-import pyaudio
 from collections import deque
+from contextlib import contextmanager
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
+from numpy.lib.stride_tricks import sliding_window_view
 import sys
 
+try:
+    import pyaudio
+except ImportError:
+    # headless outputs (stdout, wav) work without it
+    pyaudio = None
+
 DEFAULT_SAMPLE_RATE = 1.024e6 
 DEFAULT_AUDIO_RATE = 48000
 DEFAULT_BUFFER_SIZE = 65536
 DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_AUDIO_LATENCY = 0.1  # seconds buffered before playback starts
+DEFAULT_RING_SIZE = 4
+DEFAULT_BLOCK_SIZE = 65536
+DEFAULT_QUEUE_DEPTH = 4
+DEFAULT_RETUNE_INTERVAL = 0.1  # seconds between hardware retunes, the pll needs time to lock
+COMMAND_FLUSH_TIMEOUT = 1.0
+STATS_BUCKETS = 24  # power of two microsecond latency buckets, the last one is everything above ~4 s
+STATS_SMOOTHING = 0.1
+DSP_STAGES = ('channelize', 'demodulate', 'resample', 'process_audio')
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+THREAD_BACKEND = 'thread'
+PROCESS_BACKEND = 'process'
+
+CHANNEL_BANDWIDTH = 100e3  # one-sided, wide fm broadcast
+MIN_CHANNEL_RATE = 200e3
+AUDIO_BANDWIDTH = 15e3
+MAX_DEVIATION = 75e3
+DEFAULT_DEEMPHASIS = 50e-6  # 75e-6 in the americas
+USABLE_BANDWIDTH = 0.9  # of the sample rate, the dongle's anti-alias filter eats the edges
 
 RTL_TCP_SET_FREQ = 0x01
 RTL_TCP_SET_SAMPLE_RATE = 0x02
@@ -25,6 +54,53 @@ RTL_TCP_SET_GAIN_MODE = 0x03  # 0 = AGC, 1 = manual gain
 RTL_TCP_SET_GAIN = 0x04
 RTL_TCP_SET_FREQ_CORRECTION = 0x05
 
+DONGLE_INFO_SIZE = 12
+TUNER_TYPES = {
+    0: 'unknown',
+    1: 'E4000',
+    2: 'FC0012',
+    3: 'FC0013',
+    4: 'FC2580',
+    5: 'R820T',
+    6: 'R828D',
+}
+
+
+def pack_command(command, value):
+    if command == RTL_TCP_SET_FREQ_CORRECTION:
+        return struct.pack('>Bi', command, int(value))
+    return struct.pack('>BI', command, int(value))
+
+
+def parse_dongle_info(header):
+    # rtl_tcp greets with "RTL0", tuner type and tuner gain count, all big endian
+    if len(header) != DONGLE_INFO_SIZE or header[:4] != b'RTL0':
+        return None
+    tuner, gain_count = struct.unpack('>II', header[4:])
+    return {'tuner': TUNER_TYPES.get(tuner, 'unknown'), 'tuner_type': tuner, 'gain_count': gain_count}
+
+
+def make_iq_lut():
+    # one entry per (I, Q) byte pair, indexed by the pair read as a native uint16
+    pairs = np.arange(65536, dtype=np.uint16).view(np.uint8).reshape(-1, 2)
+    pairs = (pairs.astype(np.float32) - 127.5) / 127.5
+    lut = np.empty(65536, dtype=np.complex64)
+    lut.real = pairs[:, 0]
+    lut.imag = pairs[:, 1]
+    return lut
+
+IQ_LUT = make_iq_lut()
+
+
+def iq_from_bytes(raw, out=None, index=None):
+    # take() wants intp indices and buffers out= in 'raise' mode, a reusable
+    # index array and 'clip' (pairs always fit the table) avoid both temporaries
+    pairs = raw.view(np.uint16)
+    if index is not None:
+        np.copyto(index, pairs)
+        pairs = index
+    return np.take(IQ_LUT, pairs, out=out, mode='clip')
+
 class Log:
     COLORS = {
         'reset': '\033[0m',
@@ -57,27 +133,30 @@ class Log:
     }
 
     SILENT = False
+    STREAM = None  # defaults to stdout
 
     @classmethod
-    def config(cls, silent: bool = False):
+    def config(cls, silent: bool = False, stream=None):
         cls.SILENT = silent
+        cls.STREAM = stream
 
     @classmethod
     def print(cls, message: str, style: str = '', icon: str = '', end: str = '\n'):
         if cls.SILENT: return
+        stream = cls.STREAM or sys.stdout
         color = cls.COLORS.get(style, '')
         icon_char = cls.ICONS.get(icon, '')
         if icon_char:
             if color:
-                print(f"{color}[{icon_char}]\033[0m {message}", end=end)
+                print(f"{color}[{icon_char}]\033[0m {message}", end=end, file=stream)
             else:
-                print(f"[{icon_char}] {message}", end=end)
+                print(f"[{icon_char}] {message}", end=end, file=stream)
         else:
             if color:
-                print(f"{color}{message}\033[0m", end=end)
+                print(f"{color}{message}\033[0m", end=end, file=stream)
             else:
-                print(f"{message}", end=end)
-        sys.stdout.flush()
+                print(f"{message}", end=end, file=stream)
+        stream.flush()
 
     @classmethod
     def info(cls, message: str):
@@ -100,41 +179,169 @@ class Log:
         cls.print(message, 'bright_magenta', 'broadcast')
 
 
+class CommandScheduler:
+    # commands wait here for a writer thread: only the latest value per command is kept,
+    # whatever is pending goes out in one write, and retunes are spaced retune_interval apart
+    def __init__(self, write, retune_interval=DEFAULT_RETUNE_INTERVAL):
+        self.write = write
+        self.retune_interval = retune_interval
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.holding = 0
+        self.writing = False
+        self.running = False
+        self.thread = None
+        self.last_retune = None
+        self.coalesced = 0
+        self.writes = 0
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+            self.pending.clear()
+            self.last_retune = None
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.pending.clear()
+            self.cond.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
+
+    def submit(self, command, value):
+        with self.cond:
+            if command in self.pending:
+                # re-inserted so commands still go out in the order they were last set
+                del self.pending[command]
+                self.coalesced += 1
+            self.pending[command] = value
+            self.cond.notify_all()
+
+    @contextmanager
+    def batch(self):
+        # nothing is written until the block ends, so its commands share one write
+        with self.cond:
+            self.holding += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.holding -= 1
+                self.cond.notify_all()
+
+    def flush(self, timeout=COMMAND_FLUSH_TIMEOUT):
+        # waits until every command submitted so far is on the wire
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.running or not (self.pending or self.writing), timeout)
+
+    def retune_wait(self):
+        if RTL_TCP_SET_FREQ not in self.pending or self.last_retune is None:
+            return 0
+        return self.last_retune + self.retune_interval - time.monotonic()
+
+    def take_ready(self):
+        wait = self.retune_wait()
+        ready = [(command, value) for command, value in self.pending.items()
+                 if command != RTL_TCP_SET_FREQ or wait <= 0]
+        for command, _ in ready:
+            del self.pending[command]
+        if any(command == RTL_TCP_SET_FREQ for command, _ in ready):
+            self.last_retune = time.monotonic()
+        return ready, wait
+
+    def write_loop(self):
+        while True:
+            with self.cond:
+                while True:
+                    if not self.running:
+                        return
+                    if self.pending and not self.holding:
+                        ready, wait = self.take_ready()
+                        if ready:
+                            break
+                        # only a retune left and it is too early for it
+                        self.cond.wait(wait)
+                    else:
+                        self.cond.wait()
+                self.writing = True
+            try:
+                self.write(b''.join(pack_command(command, value) for command, value in ready))
+                self.writes += 1
+            except Exception as e:
+                Log.error(f"Command failed: {e}")
+            finally:
+                with self.cond:
+                    self.writing = False
+                    self.cond.notify_all()
+
+
 class RTLTCPClient:
-    def __init__(self, host, port):
+    def __init__(self, host, port, ring_size=DEFAULT_RING_SIZE):
         self.host = host
         self.port = port
         self.socket = None
         self.connected = False
         self.agc_enabled = False
         self.current_gain = 0.0
+        self.dongle_info = None
+        self.recorder = None
+        self.commands = CommandScheduler(self.write_commands)
+
+        # read_samples hands out views into this ring, a block stays valid
+        # for ring_size - 1 further reads
+        self.ring_size = ring_size
+        self.ring_samples = 0
+        self.ring_index = 0
+        self.raw_ring = []
+        self.iq_ring = []
+        self.index = None
 
     def connect(self):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(5)
             self.socket.connect((self.host, self.port))
+            header = bytearray(DONGLE_INFO_SIZE)
+            if not self.recv_exact(header):
+                raise ConnectionError("connection closed before dongle info")
+            self.dongle_info = parse_dongle_info(header)
             self.connected = True
-            Log.success(f"Connected to RTL-TCP at {self.host}:{self.port}")
+            self.commands.start()
+            self.log_connected()
             return True
         except Exception as e:
             Log.error(f"Connection failed: {e}")
             return False
 
+    def log_connected(self):
+        Log.success(f"Connected to RTL-TCP at {self.host}:{self.port}")
+        if self.dongle_info:
+            Log.info(f"Tuner {self.dongle_info['tuner']}, {self.dongle_info['gain_count']} gain steps")
+        else:
+            Log.warning("Server did not send dongle info")
+
     def send_command(self, command, value):
+        # queued, the scheduler thread does the actual write
         if not self.connected:
             Log.warning("Cannot send command, not connected")
             return False
-        try:
-            if command == RTL_TCP_SET_FREQ_CORRECTION:
-                data = struct.pack('>Bi', command, int(value))
-            else:
-                data = struct.pack('>BI', command, int(value))
-            self.socket.send(data)
-            return True
-        except Exception as e:
-            Log.error(f"Command failed: {e}")
-            return False
+        self.commands.submit(command, value)
+        return True
+
+    def write_commands(self, data):
+        self.socket.sendall(data)
+
+    def batch(self):
+        return self.commands.batch()
+
+    def flush_commands(self, timeout=COMMAND_FLUSH_TIMEOUT):
+        return self.commands.flush(timeout)
 
     def set_frequency(self, freq_hz):
         return self.send_command(RTL_TCP_SET_FREQ, freq_hz)
@@ -169,28 +376,90 @@ class RTLTCPClient:
     def disable_hardware_agc(self):
         return self.set_gain_mode(manual=True)
 
+    def next_slot(self, num_samples):
+        if num_samples != self.ring_samples or len(self.raw_ring) != self.ring_size:
+            self.raw_ring = [np.empty(num_samples * 2, dtype=np.uint8) for _ in range(self.ring_size)]
+            self.iq_ring = [np.empty(num_samples, dtype=np.complex64) for _ in range(self.ring_size)]
+            self.index = np.empty(num_samples, dtype=np.intp)
+            self.ring_samples = num_samples
+            self.ring_index = 0
+        i = self.ring_index
+        self.ring_index = (i + 1) % self.ring_size
+        return self.raw_ring[i], self.iq_ring[i]
+
+    def next_block(self):
+        # the array the next read_samples call fills, None until the ring exists
+        if len(self.iq_ring) != self.ring_size:
+            return None
+        return self.iq_ring[self.ring_index]
+
+    def recv_exact(self, buffer):
+        view = memoryview(buffer)
+        got = 0
+        while got < len(view):
+            n = self.socket.recv_into(view[got:], min(DEFAULT_BUFFER_SIZE, len(view) - got))
+            if n == 0:
+                return False
+            got += n
+        return True
+
     def read_samples(self, num_samples):
         if not self.connected:
             return None
         try:
-            bytes_needed = num_samples * 2
-            data = b''
-            while len(data) < bytes_needed:
-                chunk = self.socket.recv(min(DEFAULT_BUFFER_SIZE, bytes_needed - len(data)))
-                if not chunk:
-                    break
-                data += chunk
-            if len(data) < bytes_needed:
+            raw, iq = self.next_slot(num_samples)
+            if not self.recv_exact(raw):
                 return None
-            raw_samples = np.frombuffer(data, dtype=np.uint8)
-            i_samples = (raw_samples[0::2] - 127.5) / 127.5
-            q_samples = (raw_samples[1::2] - 127.5) / 127.5
-            return i_samples + 1j * q_samples
+            recorder = self.recorder
+            if recorder:
+                recorder.write(raw)
+            return iq_from_bytes(raw, out=iq, index=self.index)
         except Exception as e:
             Log.error(f"Read error: {e}")
             return None
 
+    def drain(self):
+        # drop whatever the socket already holds, after a retune it is all from the old frequency
+        if not self.connected:
+            return 0
+        scratch = bytearray(DEFAULT_BUFFER_SIZE)
+        dropped = 0
+        try:
+            self.socket.setblocking(False)
+            while True:
+                try:
+                    n = self.socket.recv_into(scratch)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if n == 0:
+                    break
+                dropped += n
+        except OSError as e:
+            Log.error(f"Drain failed: {e}")
+        finally:
+            self.socket.settimeout(5)
+        # keep I and Q paired
+        if dropped % 2 and self.recv_exact(memoryview(scratch)[:1]):
+            dropped += 1
+        return dropped // 2
+
+    def read_raw(self, buffer):
+        # fill a caller owned uint8 buffer with raw interleaved IQ
+        if not self.connected:
+            return False
+        try:
+            if not self.recv_exact(buffer):
+                return False
+            recorder = self.recorder
+            if recorder:
+                recorder.write(buffer)
+            return True
+        except Exception as e:
+            Log.error(f"Read error: {e}")
+            return False
+
     def disconnect(self):
+        self.commands.stop()
         if self.socket:
             self.socket.close()
             self.connected = False
@@ -198,49 +467,500 @@ class RTLTCPClient:
 
 
 class FMDemodulator:
-    def __init__(self):
-        self.dc_accum = 0
-
-    def demodulate(self, samples): # yes, claude made that, its one of the only things i swear
-        if len(samples) < 2:
-            return np.array([])
-        phase = np.angle(samples)
-        phase_diff = np.diff(phase)
-        phase_diff = np.mod(phase_diff + np.pi, 2*np.pi) - np.pi
-        alpha = 0.99
-        for i in range(len(phase_diff)):
-            self.dc_accum = alpha * self.dc_accum + (1 - alpha) * phase_diff[i]
-            phase_diff[i] -= self.dc_accum
+    def __init__(self, dc_alpha=0.99):
+        self.dc_alpha = dc_alpha
+        # dc blocker as an iir: dc[n] = a*dc[n-1] + (1-a)*x[n]
+        self.dc_b = np.array([1 - dc_alpha], dtype=np.float32)
+        self.dc_a = np.array([1, -dc_alpha], dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.dc_zi = np.zeros(1, dtype=np.float32)
+        self.last_sample = None
+
+    def demodulate(self, samples):
+        if len(samples) == 0:
+            return np.array([], dtype=np.float32)
+        # carry the last sample over so the first output of a block is not a click
+        prev = samples[0] if self.last_sample is None else self.last_sample
+        product = np.empty(len(samples), dtype=np.result_type(samples, np.complex64))
+        product[0] = samples[0] * np.conj(prev)
+        np.multiply(samples[1:], np.conj(samples[:-1]), out=product[1:])
+        self.last_sample = samples[-1]
+        phase_diff = np.angle(product)
+        dc, self.dc_zi = signal.lfilter(self.dc_b, self.dc_a, phase_diff, zi=self.dc_zi)
+        phase_diff -= dc
         return phase_diff
 
 
+class SpectrumTap:
+    # latest power spectrum of the capture for the ui, computed at most fps times a second
+    def __init__(self, bins=256, fps=30, fft_size=1024):
+        self.bins = bins
+        self.fft_size = max(fft_size, bins)
+        self.interval = 1.0 / fps
+        self.window = signal.get_window('hann', self.fft_size).astype(np.float32)
+        self.last = 0.0
+        # replaced, never written in place, so a reader always sees a whole row
+        self.latest = None
+        self.seq = 0
+
+    def due(self):
+        return time.monotonic() - self.last >= self.interval
+
+    def update(self, samples):
+        if len(samples) < self.fft_size or not self.due():
+            return
+        self.last = time.monotonic()
+        spectrum = np.fft.fft(samples[:self.fft_size] * self.window)
+        power = np.fft.fftshift(spectrum.real ** 2 + spectrum.imag ** 2)
+        # peak per group of bins so narrow carriers survive the decimation
+        power = power[:self.bins * (self.fft_size // self.bins)].reshape(self.bins, -1).max(axis=1)
+        self.latest = (10 * np.log10(power / self.fft_size + 1e-12)).astype(np.float32)
+        self.seq += 1
+
+
+class NCO:
+    # shifts the band by -offset hz, phase carries over between blocks
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.ramp = None
+        self.ramp_offset = None
+        self.out = None
+        self.reset()
+
+    def reset(self):
+        self.phase = 0.0
+
+    def process(self, samples, offset):
+        if not offset:
+            return samples
+        n = len(samples)
+        step = -2 * np.pi * offset / self.sample_rate
+        if self.ramp_offset != offset or len(self.ramp) != n:
+            # block sizes are fixed, so the ramp is only rebuilt on a retune
+            self.ramp = np.exp(1j * step * np.arange(n)).astype(np.complex64)
+            self.ramp_offset = offset
+            self.out = np.empty(n, dtype=np.complex64)
+        np.multiply(samples, self.ramp, out=self.out)
+        self.out *= np.complex64(np.exp(1j * self.phase))
+        self.phase = (self.phase + step * n) % (2 * np.pi)
+        return self.out
+
+
+@lru_cache(maxsize=None)
+def design_lowpass(numtaps, cutoff, rate):
+    return signal.firwin(numtaps, cutoff, fs=rate).astype(np.float32)
+
+
+class StreamingResampler:
+    # polyphase up/down fir resampler that keeps its history and phase between blocks
+    def __init__(self, up, down, taps):
+        g = gcd(up, down)
+        self.up = up // g
+        self.down = down // g
+        taps = np.asarray(taps, dtype=np.float32) * self.up
+        self.ntaps = -(-len(taps) // self.up)
+        padded = np.zeros(self.ntaps * self.up, dtype=np.float32)
+        padded[:len(taps)] = taps
+        # branch p holds taps p, p + up, p + 2*up ... reversed to match sliding windows
+        self.polyphase = np.ascontiguousarray(padded.reshape(self.ntaps, self.up).T[:, ::-1])
+        self.reset()
+
+    def reset(self):
+        self.history = None
+        self.offset = 0  # next output position, in upsampled samples from the block start
+
+    def process(self, x):
+        k = self.ntaps
+        if self.history is None or self.history.dtype != x.dtype:
+            self.history = np.zeros(k - 1, dtype=x.dtype)
+        ext = np.concatenate((self.history, x))
+        total = len(x) * self.up
+        count = max(0, -(-(total - self.offset) // self.down))
+        out = np.empty(count, dtype=x.dtype)
+        # windows[i] ends on x[i]
+        windows = sliding_window_view(ext, k)
+        for r in range(min(self.up, count)):
+            base, phase = divmod(self.offset + r * self.down, self.up)
+            rows = windows[base::self.down][:len(range(r, count, self.up))]
+            out[r::self.up] = rows @ self.polyphase[phase]
+        self.offset += count * self.down - total
+        self.history = ext[len(ext) - (k - 1):].copy()
+        return out
+
+
+def make_audio_resampler(channel_rate, audio_rate):
+    ratio = Fraction(int(audio_rate), int(channel_rate))
+    upsampled_rate = channel_rate * ratio.numerator
+    cutoff = min(AUDIO_BANDWIDTH, 0.4 * audio_rate)
+    numtaps = int(4 * upsampled_rate / (audio_rate / 2 - cutoff)) | 1
+    return StreamingResampler(
+        ratio.numerator, ratio.denominator,
+        design_lowpass(numtaps, cutoff, upsampled_rate))
+
+
+class DecimationChain:
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, audio_rate=DEFAULT_AUDIO_RATE):
+        self.sample_rate = int(sample_rate)
+        self.audio_rate = int(audio_rate)
+
+        # stage 1: channel filter + integer decimation, before the discriminator
+        self.channel_decimation = self.pick_channel_decimation(self.sample_rate, self.audio_rate)
+        self.channel_rate = self.sample_rate // self.channel_decimation
+        transition = self.channel_rate - 2 * CHANNEL_BANDWIDTH if self.channel_decimation > 1 else CHANNEL_BANDWIDTH
+        numtaps = int(4 * self.sample_rate / transition) | 1
+        self.channel_filter = StreamingResampler(
+            1, self.channel_decimation,
+            design_lowpass(numtaps, CHANNEL_BANDWIDTH, self.sample_rate))
+
+        # stage 2: rational audio resampling, after the discriminator
+        self.audio_filter = make_audio_resampler(self.channel_rate, self.audio_rate)
+
+    @staticmethod
+    def pick_channel_decimation(sample_rate, audio_rate):
+        # largest decimation that keeps the fm channel and gives the simplest audio ratio
+        best, best_up = 1, None
+        for d in range(1, int(sample_rate // MIN_CHANNEL_RATE) + 1):
+            if sample_rate % d:
+                continue
+            up = Fraction(audio_rate, sample_rate // d).numerator
+            if best_up is None or up <= best_up:
+                best, best_up = d, up
+        return best
+
+    def reset(self):
+        self.channel_filter.reset()
+        self.audio_filter.reset()
+
+    def channelize(self, samples):
+        return self.channel_filter.process(samples)
+
+    def resample_audio(self, audio):
+        return self.audio_filter.process(audio)
+
+
+@lru_cache(maxsize=None)
+def design_deemphasis(rate, tau):
+    # single pole rc lowpass, matched z
+    a = np.exp(-1.0 / (rate * tau))
+    return np.array([1 - a], dtype=np.float32), np.array([1, -a], dtype=np.float32)
+
+
+class AudioPostProcessor:
+    def __init__(self, audio_rate=DEFAULT_AUDIO_RATE, channel_rate=DEFAULT_SAMPLE_RATE,
+                 deemphasis=DEFAULT_DEEMPHASIS, target=0.3, attack=0.01, release=0.5,
+                 max_gain=100.0, frame=64):
+        self.audio_rate = audio_rate
+        # discriminator output for a full 75 kHz deviation
+        self.full_scale = 2 * np.pi * MAX_DEVIATION / channel_rate
+        self.target = target
+        self.max_gain = max_gain
+        self.frame = frame
+        frame_time = frame / audio_rate
+        self.attack_coef = np.exp(-frame_time / attack)
+        self.release_coef = np.exp(-frame_time / release)
+        self.b, self.a = design_deemphasis(audio_rate, deemphasis) if deemphasis else (None, None)
+        self.level = 0.0
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros(1, dtype=np.float32)
+        self.envelope = None
+        self.gain = None
+
+    def agc(self, audio):
+        n = len(audio)
+        starts = np.arange(0, n, self.frame)
+        power = np.add.reduceat(audio * audio, starts) / np.diff(starts, append=n)
+        levels = np.sqrt(power)
+        # only the envelope follower walks frames in python, a few dozen per block
+        gains = np.empty(len(levels), dtype=np.float32)
+        env = self.envelope if self.envelope is not None else float(levels[0])
+        floor = self.target / self.max_gain
+        if self.gain is None:
+            self.gain = self.target / max(env, floor)
+        for i, level in enumerate(levels):
+            coef = self.attack_coef if level > env else self.release_coef
+            env = coef * env + (1 - coef) * level
+            gains[i] = self.target / max(env, floor)
+        self.envelope = env
+        # ramp from the last gain of the previous block so there is no zipper noise
+        centers = starts + (self.frame - 1) / 2
+        gain = np.interp(np.arange(n, dtype=np.float32), np.concatenate(([-1.0], centers)),
+                         np.concatenate(([self.gain], gains))).astype(np.float32)
+        self.gain = float(gains[-1])
+        return gain
+
+    def process(self, audio):
+        audio = audio.astype(np.float32, copy=False)
+        if len(audio) == 0:
+            return audio
+        rms = float(np.sqrt(np.mean(audio * audio)))
+        self.level = min(1.0, 2 * rms / self.full_scale)
+        if self.b is not None:
+            audio, self.zi = signal.lfilter(self.b, self.a, audio, zi=self.zi)
+        audio *= self.agc(audio)
+        return np.clip(audio, -1.0, 1.0, out=audio)
+
+
+class BlockQueue:
+    # bounded hand-off between pipeline threads
+    def __init__(self, depth=DEFAULT_QUEUE_DEPTH, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.depth = depth
+        self.policy = policy
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        # put but not yet marked done by the consumer, like queue.Queue's unfinished tasks
+        self.unfinished = 0
+
+    def put(self, item, timeout=None):
+        with self.cond:
+            if self.policy == BLOCK:
+                if not self.cond.wait_for(lambda: len(self.items) < self.depth or self.closed, timeout):
+                    return False
+            elif len(self.items) >= self.depth:
+                self.items.popleft()
+                self.dropped += 1
+                self.unfinished -= 1
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.unfinished += 1
+            self.cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def clear(self):
+        with self.cond:
+            self.unfinished -= len(self.items)
+            self.items.clear()
+            self.cond.notify_all()
+
+    def task_done(self):
+        with self.cond:
+            self.unfinished -= 1
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class StageTimer:
+    # latency histogram and sample counters for one pipeline stage, only its own thread
+    # writes to it, readers get a snapshot that may be a block behind
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * STATS_BUCKETS
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.samples_in = 0
+        self.samples_out = 0
+        self.rate = 0.0
+        self.last = None
+
+    def record(self, elapsed, samples_in=0, samples_out=0):
+        now = time.perf_counter()
+        self.buckets[min(int(elapsed * 1e6).bit_length(), STATS_BUCKETS - 1)] += 1
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.worst:
+            self.worst = elapsed
+        self.samples_in += samples_in
+        self.samples_out += samples_out
+        if self.last is not None and now > self.last:
+            # input samples per second, smoothed over the last few calls
+            instant = samples_in / (now - self.last)
+            self.rate = instant if not self.rate else self.rate + STATS_SMOOTHING * (instant - self.rate)
+        self.last = now
+
+    def percentile(self, buckets, fraction):
+        # in ms, interpolated inside the bucket the fraction falls in
+        target = fraction * sum(buckets)
+        seen = 0
+        for i, count in enumerate(buckets):
+            if count and seen + count >= target:
+                low = (1 << i) >> 1
+                return (low + (target - seen) / count * ((1 << i) - low)) / 1e3
+            seen += count
+        return 0.0
+
+    def snapshot(self):
+        buckets = list(self.buckets)
+        calls = self.calls
+        return {
+            'calls': calls,
+            'mean_ms': self.total / calls * 1e3 if calls else 0.0,
+            # a bucket spans a factor of two, the worst case bounds the estimate
+            'p50_ms': min(self.percentile(buckets, 0.5), self.worst * 1e3),
+            'p99_ms': min(self.percentile(buckets, 0.99), self.worst * 1e3),
+            'max_ms': self.worst * 1e3,
+            'samples_in': self.samples_in,
+            'samples_out': self.samples_out,
+            'rate': self.rate,
+            'idle': time.perf_counter() - self.last if self.last is not None else None,
+            'histogram': {(1 << i) / 1e3: count for i, count in enumerate(buckets) if count},
+        }
+
+
+class AudioRingBuffer:
+    # single producer / single consumer, each side only ever advances its own position
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.underruns = 0
+        self.overruns = 0
+        self.dropped = 0
+        # set by the producer, the consumer skips everything written before it
+        self.discard_pos = 0
+
+    def fill(self):
+        # what will actually be played, discarded samples no longer count
+        return self.write_pos - max(self.read_pos, self.discard_pos)
+
+    def write(self, samples):
+        # the consumer may still be reading discarded samples, only space behind read_pos is free
+        free = self.capacity - (self.write_pos - self.read_pos)
+        n = len(samples)
+        if n > free:
+            # the consumer owns read_pos, so the tail that doesn't fit is dropped
+            self.overruns += 1
+            self.dropped += n - free
+            n = free
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:n]
+        self.write_pos += n
+        return n
+
+    def discard(self):
+        self.discard_pos = self.write_pos
+
+    def read_into(self, out):
+        if self.discard_pos > self.read_pos:
+            self.read_pos = self.discard_pos
+        n = min(len(out), self.fill())
+        start = self.read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        out[n:] = 0
+        self.read_pos += n
+        if n < len(out):
+            self.underruns += 1
+        return n
+
+
+class DriftCompensator:
+    # nudges the audio rate so the playback buffer sits at its target fill,
+    # absorbing the ppm mismatch between the dongle and sound card clocks
+    def __init__(self, sample_rate, target_frames, kp=0.01, ki=0.0005, max_correction=2e-3, smoothing=0.02):
+        self.sample_rate = sample_rate
+        self.target_frames = target_frames
+        self.kp = kp
+        self.ki = ki
+        self.max_correction = max_correction
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.ratio = 1.0
+        self.integral = 0.0
+        self.error = None
+        self.position = 0.0  # next output position, relative to the last sample of the previous block
+        self.last = None
+
+    def update(self, fill, duration):
+        error = (fill - self.target_frames) / self.sample_rate
+        self.error = error if self.error is None else self.error + self.smoothing * (error - self.error)
+        self.integral += self.error * duration
+        limit = self.max_correction / self.ki
+        self.integral = max(-limit, min(limit, self.integral))
+        correction = self.kp * self.error + self.ki * self.integral
+        self.ratio = 1.0 - max(-self.max_correction, min(self.max_correction, correction))
+
+    def process(self, audio, fill):
+        if len(audio) == 0:
+            return audio
+        self.update(fill, len(audio) / self.sample_rate)
+        if self.last is None:
+            self.last = audio[0]
+        # linear interpolation is plenty for ratios this close to 1
+        ext = np.empty(len(audio) + 1, dtype=np.float32)
+        ext[0] = self.last
+        ext[1:] = audio
+        step = 1.0 / self.ratio
+        count = int(np.ceil((len(audio) - self.position) / step))
+        positions = self.position + step * np.arange(count)
+        out = np.interp(positions, np.arange(len(ext)), ext).astype(np.float32)
+        self.position = positions[-1] + step - len(audio)
+        self.last = audio[-1]
+        return out
+
+
 class AudioPlayer:
-    def __init__(self, sample_rate=48000):
+    def __init__(self, sample_rate=48000, latency=DEFAULT_AUDIO_LATENCY):
         self.sample_rate = sample_rate
         self.pyaudio = None
         self.stream = None
         self.running = False
-        self.buffer = deque(maxlen=20)
-        self.buffer_lock = threading.Lock()
+        self.target_frames = int(sample_rate * latency)
+        self.buffer = AudioRingBuffer(max(4 * self.target_frames, 4 * DEFAULT_CHUNK_SIZE))
+        self.out = np.zeros(DEFAULT_CHUNK_SIZE, dtype=np.float32)
+        self.priming = True
+        self.timer = StageTimer()
 
     def start(self):
         if self.running:
             return False
+        if pyaudio is None:
+            Log.error("PyAudio not available")
+            return False
 
         try:
             self.pyaudio = pyaudio.PyAudio()
-            
+            self.timer.reset()
+
             def callback(in_data, frame_count, time_info, status):
-                with self.buffer_lock:
-                    if not self.buffer:
-                        return (np.zeros(frame_count, dtype=np.float32).tobytes(), pyaudio.paContinue)
-                    chunk = self.buffer.popleft()
-                    if len(chunk) < frame_count:
-                        padded = np.zeros(frame_count, dtype=np.float32)
-                        padded[:len(chunk)] = chunk
-                        return (padded.tobytes(), pyaudio.paContinue)
-                    else:
-                        return (chunk[:frame_count].tobytes(), pyaudio.paContinue)
+                start = time.perf_counter()
+                if len(self.out) < frame_count:
+                    self.out = np.zeros(frame_count, dtype=np.float32)
+                out = self.out[:frame_count]
+                # after an underrun, wait for the target latency to build up again
+                played = 0
+                if self.priming and self.buffer.fill() < self.target_frames:
+                    out[:] = 0
+                else:
+                    played = self.buffer.read_into(out)
+                    self.priming = played < frame_count
+                # pyaudio wants bytes, that copy is the only allocation left in here
+                data = out.tobytes()
+                self.timer.record(time.perf_counter() - start, frame_count, played)
+                return (data, pyaudio.paContinue)
 
             self.stream = self.pyaudio.open(
                 format=pyaudio.paFloat32,
@@ -284,17 +1004,45 @@ class AudioPlayer:
     def play(self, audio_data):
         if not self.running:
             return
-        with self.buffer_lock:
-            self.buffer.append(audio_data)
+        self.buffer.write(audio_data)
+
+    def flush(self):
+        # drop queued audio, playback primes again on what comes next
+        self.buffer.discard()
+        self.priming = True
+
+    def latency(self):
+        return self.buffer.fill() / self.sample_rate
 
 class LiveFMPlayer:
-    def __init__(self, host='127.0.0.1', port=1234):
-        self.rtl = RTLTCPClient(host, port)
+    def __init__(self, host='127.0.0.1', port=1234, rtl=None):
+        # rtl can be any client exposing the RTLTCPClient interface
+        self.rtl = rtl if rtl is not None else RTLTCPClient(host, port)
         self.demodulator = FMDemodulator()
-        self.audio_player = AudioPlayer(DEFAULT_AUDIO_RATE)
+        self.nco = None
+        self.chain = None
+        self.post = None
+        self.audio_player = AudioPlayer(DEFAULT_AUDIO_RATE, DEFAULT_AUDIO_LATENCY)
         self.running = False
-        self.thread = None
+        self.threads = []
+        self.iq_queue = None
+        self.backend = None
+        self.drift = None
+        self.spectrum = None
         self.rms_level = 0.0
+        # where the hardware is tuned, the wanted station sits tuning_offset away from it
+        self.center_frequency = None
+        self.tuning_offset = 0
+        # bumped on every hardware retune, blocks read before it are stale
+        self.generation = 0
+        self.dsp_generation = 0
+        self.dsp_offset = 0
+        self.stale_blocks = 0
+        # the ring block the dsp is working on, the reader must not refill it
+        self.processing = None
+        self.ring_cond = threading.Condition()
+        self.stages = {name: StageTimer() for name in ('read',) + DSP_STAGES}
+        self.started_at = None
 
         self.config = {
             'frequency': 100.0e6,
@@ -302,7 +1050,13 @@ class LiveFMPlayer:
             'audio_rate': DEFAULT_AUDIO_RATE,
             'gain': 30.0,
             'use_hardware_agc': True,
-            'freq_correction': 0
+            'freq_correction': 0,
+            'deemphasis': DEFAULT_DEEMPHASIS,
+            'queue_depth': DEFAULT_QUEUE_DEPTH,
+            'overflow_policy': DROP_OLDEST,
+            'dsp_backend': THREAD_BACKEND,
+            'drift_compensation': True,
+            'digital_tuning': True
         }
 
     def connect(self):
@@ -322,9 +1076,40 @@ class LiveFMPlayer:
        freq_hz = int(freq_mhz * 1e6)
        self.config['frequency'] = freq_hz
        if self.running:
-           return self.rtl.set_frequency(freq_hz)
+           return self.retune(freq_hz)
        return True
 
+    def tuning_span(self):
+        # how far from the hardware center a station can sit and still be fully captured
+        if not self.config['digital_tuning']:
+            return 0
+        return USABLE_BANDWIDTH * self.config['sdr_sample_rate'] / 2 - CHANNEL_BANDWIDTH
+
+    def retune(self, freq_hz):
+        span = self.tuning_span()
+        offset = freq_hz - self.center_frequency
+        if abs(offset) <= span:
+            # still inside the capture, the nco picks it up with the next block and the audio keeps playing
+            self.tuning_offset = offset
+            return True
+        # park the hardware half a span ahead, so a knob drag in the same direction stays digital
+        center = int(freq_hz + (span / 2 if offset > 0 else -span / 2))
+        if not self.tune_hardware(center):
+            return False
+        self.tuning_offset = freq_hz - center
+        self.generation += 1
+        if self.iq_queue is not None:
+            self.iq_queue.clear()
+        return True
+
+    def tune_hardware(self, center):
+        if not self.rtl.set_frequency(center):
+            return False
+        self.center_frequency = center
+        if self.rtl.recorder:
+            self.rtl.recorder.note_frequency(center)
+        return True
+
     def set_gain(self, gain_db):
         if self.config['use_hardware_agc']:
             Log.warning("Cannot set manual gain while AGC is enabled")
@@ -357,39 +1142,213 @@ class LiveFMPlayer:
 
     def initialize_sdr(self):
         success = True
-        success &= self.rtl.set_sample_rate(self.config['sdr_sample_rate'])
-        if self.config['use_hardware_agc']:
-            success &= self.rtl.enable_hardware_agc()
-        else:
-            success &= self.rtl.disable_hardware_agc()
-            success &= self.rtl.set_gain(self.config['gain'])
-        success &= self.rtl.set_freq_correction(self.config['freq_correction'])
-        success &= self.rtl.set_frequency(self.config['frequency'])
+        # one write for the whole setup
+        with self.rtl.batch():
+            success &= self.rtl.set_sample_rate(self.config['sdr_sample_rate'])
+            if self.config['use_hardware_agc']:
+                success &= self.rtl.enable_hardware_agc()
+            else:
+                success &= self.rtl.disable_hardware_agc()
+                success &= self.rtl.set_gain(self.config['gain'])
+            success &= self.rtl.set_freq_correction(self.config['freq_correction'])
+            success &= self.tune_hardware(self.config['frequency'])
+        self.tuning_offset = 0
+        # same as a hardware retune: whatever was read before is from the old settings
+        self.generation += 1
+        if self.iq_queue is not None:
+            self.iq_queue.clear()
         return success
 
     def process_audio(self, audio_data):
-        rms = np.sqrt(np.mean(audio_data**2)) + 1e-10
-        self.rms_level = min(1.0, rms*10)
-        audio_data = 0.5 * (audio_data / rms)
-        try:
-            b, a = signal.butter(4, 0.1)
-            audio_data = signal.lfilter(b, a, audio_data)
-        except:
-            pass
-        return np.clip(audio_data, -1.0, 1.0).astype(np.float32)
+        audio_data = self.post.process(audio_data)
+        self.rms_level = self.post.level
+        return audio_data
+
+    def enable_spectrum(self, bins=256, fps=30):
+        self.spectrum = SpectrumTap(bins, fps)
+        return self.spectrum
+
+    def process_block(self, samples):
+        if self.spectrum:
+            self.spectrum.update(samples)
+        offset = self.tuning_offset
+        if offset != self.dsp_offset:
+            self.dsp_offset = offset
+            self.flush_channel()
+        stages = self.stages
+        start = time.perf_counter()
+        baseband = self.chain.channelize(self.nco.process(samples, offset))
+        now = time.perf_counter()
+        stages['channelize'].record(now - start, len(samples), len(baseband))
+        start = now
+        audio = self.demodulator.demodulate(baseband)
+        now = time.perf_counter()
+        stages['demodulate'].record(now - start, len(baseband), len(audio))
+        if len(audio) == 0:
+            return audio
+        start = now
+        resampled = self.chain.resample_audio(audio)
+        now = time.perf_counter()
+        stages['resample'].record(now - start, len(audio), len(resampled))
+        start = now
+        audio = self.process_audio(resampled)
+        stages['process_audio'].record(time.perf_counter() - start, len(resampled), len(audio))
+        return audio
 
-    def stream_loop(self):
+    def build_dsp(self):
+        # the chain the dsp thread runs, a player with its own process_block builds its own
+        self.chain = DecimationChain(self.config['sdr_sample_rate'], self.config['audio_rate'])
+        self.post = AudioPostProcessor(self.config['audio_rate'], self.chain.channel_rate, self.config['deemphasis'])
+        self.demodulator.reset()
+        self.nco = NCO(self.config['sdr_sample_rate'])
+
+    def flush_channel(self):
+        # digital retune: only the mixer and the filter in front of the discriminator held the old station
+        self.nco.reset()
+        self.chain.channel_filter.reset()
+
+    def flush_dsp(self):
+        # new station: no filter, dc or agc state and no queued audio from the old one
+        self.demodulator.reset()
+        self.chain.reset()
+        self.post.reset()
+        self.flush_audio()
+
+    def flush_audio(self):
+        # the resampler would interpolate from the old station and steer on the emptied buffer
+        if self.drift:
+            self.drift.reset()
+        flush = getattr(self.audio_player, 'flush', None)
+        if flush:
+            flush()
+
+    def play_audio(self, audio):
+        if self.drift:
+            audio = self.drift.process(audio, self.audio_player.buffer.fill())
+        self.audio_player.play(audio)
+
+    def drain_after_retune(self, drained):
+        # returns the generation the socket is now clean for
+        generation = self.generation
+        if generation != drained:
+            # the retune may still be waiting in the scheduler, drain once it went out
+            self.rtl.flush_commands()
+            self.rtl.drain()
+        return generation
+
+    def reader_loop(self):
+        # only drains the socket, so rtl_tcp never waits on our dsp
+        drained = self.generation
         while self.running:
-            samples = self.rtl.read_samples(65536)
+            # taken before the drain: a retune landing after it marks this block stale instead of fresh
+            generation = self.generation
+            drained = self.drain_after_retune(drained)
+            self.wait_for_ring()
+            start = time.perf_counter()
+            samples = self.rtl.read_samples(DEFAULT_BLOCK_SIZE)
             if samples is None:
                 time.sleep(0.01)
                 continue
-            audio = self.demodulator.demodulate(samples)
+            self.stages['read'].record(time.perf_counter() - start, len(samples))
+            while self.running and not self.iq_queue.put((generation, samples), timeout=0.1):
+                pass
+
+    def wait_for_ring(self):
+        # drop_oldest never blocks the reader, so it can lap a slow dsp, wait rather than overwrite
+        with self.ring_cond:
+            while self.running and self.processing is not None and self.processing is self.rtl.next_block():
+                self.ring_cond.wait(0.1)
+
+    def dsp_loop(self):
+        while self.running:
+            block = self.iq_queue.get(timeout=0.1)
+            if block is None:
+                continue
+            try:
+                self.handle_block(*block)
+            finally:
+                self.iq_queue.task_done()
+
+    def handle_block(self, generation, samples):
+        if generation < self.generation:
+            # read before the dongle moved
+            self.stale_blocks += 1
+            return
+        if self.dsp_generation != generation:
+            self.dsp_generation = generation
+            self.flush_dsp()
+        with self.ring_cond:
+            self.processing = samples
+        try:
+            audio = self.process_block(samples)
+        finally:
+            with self.ring_cond:
+                self.processing = None
+                self.ring_cond.notify_all()
+        if len(audio) > 0:
+            self.play_audio(audio)
+
+    def pending_blocks(self):
+        # blocks read from the source that have not come out as audio yet
+        if self.backend:
+            return self.backend.slots - self.backend.free.qsize()
+        if self.iq_queue is not None:
+            return self.iq_queue.unfinished
+        return 0
+
+    def process_reader_loop(self):
+        scratch = None
+        drained = self.generation
+        while self.running:
+            generation, offset = self.generation, self.tuning_offset
+            drained = self.drain_after_retune(drained)
+            slot = self.backend.acquire(timeout=0.1 if self.config['overflow_policy'] == BLOCK else 0)
+            if slot is None:
+                if self.backend.failed:
+                    return
+                if self.config['overflow_policy'] == BLOCK:
+                    continue
+                # blocks already handed to the worker can't be recalled, so the newest one is dropped
+                if scratch is None:
+                    scratch = np.empty(DEFAULT_BLOCK_SIZE * 2, dtype=np.uint8)
+                if not self.rtl.read_raw(scratch):
+                    time.sleep(0.01)
+                self.backend.dropped += 1
+                continue
+            raw = self.backend.raw_slot(slot)
+            start = time.perf_counter()
+            if self.rtl.read_raw(raw):
+                self.stages['read'].record(time.perf_counter() - start, DEFAULT_BLOCK_SIZE)
+                if self.spectrum and self.spectrum.due():
+                    # only the few samples the fft needs are converted here
+                    self.spectrum.update(iq_from_bytes(raw[:2 * self.spectrum.fft_size]))
+                self.backend.submit(slot, offset, generation)
+            else:
+                self.backend.release(slot)
+                time.sleep(0.01)
+
+    def process_collect_loop(self):
+        while self.running:
+            audio = self.backend.collect(timeout=0.1)
+            if audio is None:
+                if self.backend.failed:
+                    Log.error("DSP process is gone, stopping")
+                    self.stop()
+                    return
+                continue
+            if self.backend.generation < self.generation:
+                # read before the dongle moved, the worker resets on the next one
+                self.stale_blocks += 1
+                continue
+            if self.dsp_generation != self.backend.generation:
+                self.dsp_generation = self.backend.generation
+                self.flush_audio()
+            self.rms_level = self.backend.level
+            # timed in the worker, recorded here so both backends report the same stages
+            for name, (elapsed, samples_in, samples_out) in zip(DSP_STAGES, self.backend.timings):
+                self.stages[name].record(elapsed, samples_in, samples_out)
             if len(audio) > 0:
-                audio = resample_poly(audio, self.config['audio_rate'], int(self.config['sdr_sample_rate']))
-                processed_audio = self.process_audio(audio)
-                for i in range(0, len(processed_audio), DEFAULT_CHUNK_SIZE):
-                    self.audio_player.play(processed_audio[i:i+DEFAULT_CHUNK_SIZE])
+                self.play_audio(audio)
 
     def start(self):
         if self.running:
@@ -400,9 +1359,35 @@ class LiveFMPlayer:
         if not self.audio_player.start():
             Log.error("Failed to start audio player")
             return False
+        self.drift = None
+        # only a real playback buffer has a fill level to steer on
+        if self.config['drift_compensation'] and getattr(self.audio_player, 'buffer', None) is not None:
+            self.drift = DriftCompensator(self.config['audio_rate'], self.audio_player.target_frames)
+        if self.config['dsp_backend'] == PROCESS_BACKEND:
+            from radproc import ProcessDSPBackend
+            self.backend = ProcessDSPBackend(
+                self.config['sdr_sample_rate'], self.config['audio_rate'], self.config['deemphasis'],
+                DEFAULT_BLOCK_SIZE, self.config['queue_depth'] + 2)
+            if not self.backend.start():
+                self.backend = None
+                self.audio_player.stop()
+                return False
+            loops = [self.process_reader_loop, self.process_collect_loop]
+        else:
+            self.build_dsp()
+            self.iq_queue = BlockQueue(self.config['queue_depth'], self.config['overflow_policy'])
+            # queued blocks plus the one being read and the one being processed
+            self.rtl.ring_size = self.config['queue_depth'] + 2
+            loops = [self.reader_loop, self.dsp_loop]
+        self.dsp_generation = self.generation
+        self.dsp_offset = self.tuning_offset
+        for timer in self.stages.values():
+            timer.reset()
+        self.started_at = time.monotonic()
         self.running = True
-        self.thread = threading.Thread(target=self.stream_loop, daemon=True)
-        self.thread.start()
+        self.threads = [threading.Thread(target=loop, daemon=True) for loop in loops]
+        for thread in self.threads:
+            thread.start()
         Log.success("Live FM streaming started")
         return True
 
@@ -410,11 +1395,79 @@ class LiveFMPlayer:
         if not self.running:
             return
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        if self.iq_queue:
+            self.iq_queue.close()
+        for thread in self.threads:
+            # the collect loop stops the player itself when the worker dies
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self.threads = []
+        if self.backend:
+            self.backend.stop()
+            self.backend = None
         self.audio_player.stop()
         Log.info("Live FM streaming stopped")
 
+    def get_stats(self):
+        # a snapshot of counters that are always kept, cheap enough to poll every frame
+        configured = self.config['sdr_sample_rate']
+        stages = {name: timer.snapshot() for name, timer in self.stages.items()}
+        player_timer = getattr(self.audio_player, 'timer', None)
+        if player_timer is not None:
+            stages['audio_callback'] = player_timer.snapshot()
+        read = stages['read']
+        elapsed = time.monotonic() - self.started_at if self.running else 0.0
+        stats = {
+            'running': self.running,
+            'backend': self.config['dsp_backend'],
+            'uptime': elapsed,
+            'input_rate': read['rate'],
+            'configured_rate': configured,
+            'average_input_rate': read['samples_in'] / elapsed if elapsed > 0 else 0.0,
+            'audio_rate': self.config['audio_rate'],
+            'stale_blocks': self.stale_blocks,
+            'stages': stages,
+        }
+
+        if self.backend:
+            in_flight = self.backend.slots - self.backend.free.qsize()
+            stats['iq_queue'] = {'fill': in_flight, 'depth': self.backend.slots, 'dropped': self.backend.dropped}
+        elif self.iq_queue is not None:
+            stats['iq_queue'] = {'fill': len(self.iq_queue), 'depth': self.iq_queue.depth, 'dropped': self.iq_queue.dropped}
+
+        buffer = getattr(self.audio_player, 'buffer', None)
+        if buffer is not None:
+            rate = self.audio_player.sample_rate
+            stats['audio'] = {
+                'fill': buffer.fill() / rate,
+                'target': self.audio_player.target_frames / rate,
+                'capacity': buffer.capacity / rate,
+                'underruns': buffer.underruns,
+                'overruns': buffer.overruns,
+                'dropped': buffer.dropped,
+                'drift_ratio': self.drift.ratio if self.drift else 1.0,
+            }
+
+        commands = getattr(self.rtl, 'commands', None)
+        if commands is not None:
+            stats['commands'] = {'writes': commands.writes, 'coalesced': commands.coalesced}
+        return stats
+
+    def start_recording(self, path):
+        from radrec import IQRecorder
+        self.stop_recording()
+        gain = None if self.config['use_hardware_agc'] else self.config['gain']
+        # the recording holds the whole capture, so it is labelled with the hardware center
+        center = self.center_frequency if self.running else self.config['frequency']
+        self.rtl.recorder = IQRecorder(path, center, self.config['sdr_sample_rate'], gain)
+        return self.rtl.recorder.start()
+
+    def stop_recording(self):
+        if self.rtl.recorder:
+            self.rtl.recorder.stop()
+            self.rtl.recorder = None
+
     def disconnect(self):
+        self.stop_recording()
         self.rtl.disconnect()
         self.rms_level = 0
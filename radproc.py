@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+RadProc - Process backed DSP for RadLive
+Demodulation runs in a worker process, IQ and audio blocks move through shared memory slots
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import time
+import numpy as np
+
+from radlive import (
+    Log, DecimationChain, FMDemodulator, AudioPostProcessor, NCO, iq_from_bytes,
+    DEFAULT_SAMPLE_RATE, DEFAULT_AUDIO_RATE, DEFAULT_DEEMPHASIS, DEFAULT_BLOCK_SIZE, DEFAULT_QUEUE_DEPTH
+)
+
+
+def audio_slot_size(block_size, sample_rate, audio_rate):
+    # the resampler can emit one extra sample depending on its phase
+    return int(np.ceil(block_size * audio_rate / sample_rate)) + 1
+
+
+def dsp_worker(iq_name, audio_name, slots, block_size, audio_size,
+               sample_rate, audio_rate, deemphasis, jobs, results):
+    iq_shm = shared_memory.SharedMemory(name=iq_name)
+    audio_shm = shared_memory.SharedMemory(name=audio_name)
+    raw_slots = np.ndarray((slots, block_size * 2), dtype=np.uint8, buffer=iq_shm.buf)
+    audio_slots = np.ndarray((slots, audio_size), dtype=np.float32, buffer=audio_shm.buf)
+    try:
+        iq = np.empty(block_size, dtype=np.complex64)
+        index = np.empty(block_size, dtype=np.intp)
+        chain = DecimationChain(sample_rate, audio_rate)
+        demodulator = FMDemodulator()
+        nco = NCO(sample_rate)
+        post = AudioPostProcessor(audio_rate, chain.channel_rate, deemphasis)
+        # a single worker and fifo queues keep blocks in order and filter state continuous
+        current = None
+        current_offset = 0
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            seq, slot, offset, generation = job
+            if generation != current:
+                # retuned, start the new station from clean state
+                current = generation
+                chain.reset()
+                demodulator.reset()
+                post.reset()
+            if offset != current_offset:
+                # digital retune, same as LiveFMPlayer.flush_channel
+                current_offset = offset
+                nco.reset()
+                chain.channel_filter.reset()
+            # per stage (seconds, samples in, samples out), same stages as LiveFMPlayer.process_block
+            start = time.perf_counter()
+            baseband = chain.channelize(nco.process(iq_from_bytes(raw_slots[slot], out=iq, index=index), offset))
+            now = time.perf_counter()
+            timings = [(now - start, block_size, len(baseband))]
+            start = now
+            audio = demodulator.demodulate(baseband)
+            now = time.perf_counter()
+            timings.append((now - start, len(baseband), len(audio)))
+            if len(audio) > 0:
+                start = now
+                resampled = chain.resample_audio(audio)
+                now = time.perf_counter()
+                timings.append((now - start, len(audio), len(resampled)))
+                start = now
+                audio = post.process(resampled)
+                timings.append((time.perf_counter() - start, len(resampled), len(audio)))
+            audio_slots[slot, :len(audio)] = audio
+            results.put((seq, slot, len(audio), post.level, generation, timings))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        # exit cleanly, the parent notices the process is gone and stops the player
+        Log.error(f"DSP process failed: {e}")
+    finally:
+        del raw_slots, audio_slots
+        iq_shm.close()
+        audio_shm.close()
+
+
+class ProcessDSPBackend:
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, audio_rate=DEFAULT_AUDIO_RATE,
+                 deemphasis=DEFAULT_DEEMPHASIS, block_size=DEFAULT_BLOCK_SIZE, slots=DEFAULT_QUEUE_DEPTH + 2):
+        self.sample_rate = int(sample_rate)
+        self.audio_rate = int(audio_rate)
+        self.deemphasis = deemphasis
+        self.block_size = block_size
+        self.slots = slots
+        self.audio_size = audio_slot_size(block_size, self.sample_rate, self.audio_rate)
+
+        self.iq_shm = None
+        self.audio_shm = None
+        self.raw_slots = None
+        self.audio_slots = None
+        self.process = None
+        self.jobs = None
+        self.results = None
+        self.free = queue.Queue()
+        self.next_seq = 0
+        self.expected_seq = 0
+        self.level = 0.0
+        self.generation = 0
+        self.dropped = 0
+        self.timings = ()
+        self.failed = False
+
+    def start(self):
+        try:
+            self.iq_shm = shared_memory.SharedMemory(create=True, size=self.slots * self.block_size * 2)
+            self.audio_shm = shared_memory.SharedMemory(create=True, size=self.slots * self.audio_size * 4)
+            self.raw_slots = np.ndarray((self.slots, self.block_size * 2), dtype=np.uint8, buffer=self.iq_shm.buf)
+            self.audio_slots = np.ndarray((self.slots, self.audio_size), dtype=np.float32, buffer=self.audio_shm.buf)
+
+            # spawn, forking a process that holds a gl context and audio threads is asking for trouble
+            ctx = mp.get_context('spawn')
+            self.jobs = ctx.Queue()
+            self.results = ctx.Queue()
+            self.process = ctx.Process(
+                target=dsp_worker,
+                args=(self.iq_shm.name, self.audio_shm.name, self.slots, self.block_size, self.audio_size,
+                      self.sample_rate, self.audio_rate, self.deemphasis, self.jobs, self.results),
+                daemon=True)
+            self.process.start()
+        except Exception as e:
+            Log.error(f"Failed to start DSP process: {e}")
+            self.stop()
+            return False
+
+        for slot in range(self.slots):
+            self.free.put(slot)
+        Log.success(f"DSP process started (pid {self.process.pid})")
+        return True
+
+    def alive(self):
+        # a dead worker keeps its slots, nothing would ever come back from it
+        if self.failed:
+            return False
+        if self.process is None or not self.process.is_alive():
+            self.failed = True
+            exitcode = self.process.exitcode if self.process else None
+            Log.error(f"DSP process exited (code {exitcode})")
+            return False
+        return True
+
+    def acquire(self, timeout=None):
+        try:
+            return self.free.get(timeout=timeout) if timeout else self.free.get_nowait()
+        except queue.Empty:
+            self.alive()
+            return None
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def raw_slot(self, slot):
+        return self.raw_slots[slot]
+
+    def submit(self, slot, offset=0, generation=0):
+        self.jobs.put((self.next_seq, slot, offset, generation))
+        self.next_seq += 1
+
+    def collect(self, timeout=None):
+        try:
+            seq, slot, count, level, generation, timings = self.results.get(timeout=timeout)
+        except queue.Empty:
+            self.alive()
+            return None
+        if seq != self.expected_seq:
+            Log.warning(f"DSP process returned block {seq}, expected {self.expected_seq}")
+        self.expected_seq = seq + 1
+        self.level = level
+        self.generation = generation
+        self.timings = timings
+        audio = self.audio_slots[slot, :count].copy()
+        self.release(slot)
+        return audio
+
+    def stop(self):
+        if self.process and self.process.pid is not None:
+            self.jobs.put(None)
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.process = None
+        self.raw_slots = None
+        self.audio_slots = None
+        for shm in (self.iq_shm, self.audio_shm):
+            if shm:
+                shm.close()
+                shm.unlink()
+        self.iq_shm = None
+        self.audio_shm = None
+        self.free = queue.Queue()
+        Log.info("DSP process stopped")
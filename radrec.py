@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+RadRec - IQ recording and playback for RadLive
+Recordings are raw rtl_tcp bytes (.cu8) with a small json sidecar
+"""
+import json
+import os
+import threading
+import time
+import numpy as np
+
+from radlive import Log, RTLTCPClient, iq_from_bytes, RTL_TCP_SET_SAMPLE_RATE, DEFAULT_SAMPLE_RATE, DEFAULT_RING_SIZE
+
+
+def sidecar_path(path):
+    return path + '.json'
+
+
+def load_metadata(path):
+    try:
+        with open(sidecar_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+class IQRecorder:
+    def __init__(self, path, frequency, sample_rate, gain=None):
+        self.path = path
+        self.metadata = {
+            'format': 'cu8',
+            'frequency': int(frequency),
+            'sample_rate': int(sample_rate),
+            'gain': gain,  # None means hardware agc
+            'created': time.time(),
+            'retunes': [],
+        }
+        self.file = None
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        try:
+            self.file = open(self.path, 'wb')
+            self.write_metadata()
+        except OSError as e:
+            Log.error(f"Failed to start recording: {e}")
+            self.file = None
+            return False
+        Log.success(f"Recording IQ to {self.path}")
+        return True
+
+    def write(self, raw):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(raw)
+            self.samples += len(raw) // 2
+
+    def note_frequency(self, frequency):
+        # kept as sample offsets in the sidecar, playback doesn't follow them (see IQFileSource.connect)
+        with self.lock:
+            self.metadata['retunes'].append({'sample': self.samples, 'frequency': int(frequency)})
+
+    def write_metadata(self):
+        self.metadata['samples'] = self.samples
+        with open(sidecar_path(self.path), 'w') as f:
+            json.dump(self.metadata, f, indent=4)
+
+    def stop(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.file = None
+            self.write_metadata()
+        Log.info(f"Recording stopped, {self.samples} samples in {self.path}")
+
+
+class IQFileSource(RTLTCPClient):
+    # drop in for RTLTCPClient that replays a recording through a read-only memory map
+    def __init__(self, path, realtime=True, loop=False, ring_size=DEFAULT_RING_SIZE):
+        super().__init__(path, None, ring_size)
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.metadata = load_metadata(path)
+        self.sample_rate = self.metadata.get('sample_rate', DEFAULT_SAMPLE_RATE)
+        self.frequency = self.metadata.get('frequency')
+        self.data = None
+        self.position = 0
+        self.started = None
+        self.served = 0
+        self.eof = False
+
+    def connect(self):
+        try:
+            size = os.path.getsize(self.path) & ~1
+            self.data = np.memmap(self.path, dtype=np.uint8, mode='r', shape=(size,))
+        except (OSError, ValueError) as e:
+            Log.error(f"Failed to open recording: {e}")
+            return False
+        self.position = 0
+        self.served = 0
+        self.started = None
+        self.eof = False
+        self.connected = True
+        Log.success(f"Opened {self.path} ({size // 2} samples at {self.sample_rate / 1e6:.3f} MS/s)")
+        retunes = [r for r in self.metadata.get('retunes', []) if r['frequency'] != self.frequency]
+        if retunes and self.frequency:
+            # everything replays at the first center, what follows a retune is a different band
+            first = retunes[0]['sample'] / self.sample_rate
+            Log.warning(f"Recording moved to {len(retunes)} other center(s), "
+                        f"playback past {first:.1f} s is not at {self.frequency / 1e6:.3f} MHz")
+        return True
+
+    def send_command(self, command, value):
+        if not self.connected:
+            Log.warning("Cannot send command, not connected")
+            return False
+        if command == RTL_TCP_SET_SAMPLE_RATE and int(value) != int(self.sample_rate):
+            Log.warning(f"Recording is {self.sample_rate} S/s, ignoring request for {int(value)} S/s")
+        # nothing to tune, a recording is what it is
+        return True
+
+    def pace(self, num_samples):
+        if not self.realtime:
+            return
+        if self.started is None:
+            self.started = time.monotonic()
+        self.served += num_samples
+        delay = self.started + self.served / self.sample_rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def read_raw_view(self, num_samples):
+        # zero copy slice of the mapped file
+        nbytes = num_samples * 2
+        if self.position + nbytes > len(self.data):
+            if not self.loop:
+                self.eof = True
+                return None
+            self.position = 0
+        view = self.data[self.position:self.position + nbytes]
+        self.position += nbytes
+        self.pace(num_samples)
+        return view
+
+    def read_samples(self, num_samples):
+        if not self.connected:
+            return None
+        raw = self.read_raw_view(num_samples)
+        if raw is None:
+            return None
+        _, iq = self.next_slot(num_samples)
+        return iq_from_bytes(raw, out=iq, index=self.index)
+
+    def recv_exact(self, buffer):
+        view = np.frombuffer(buffer, dtype=np.uint8)
+        raw = self.read_raw_view(len(view) // 2)
+        if raw is None:
+            return False
+        view[:] = raw
+        return True
+
+    def drain(self):
+        # nothing is in flight in a file
+        return 0
+
+    def disconnect(self):
+        if self.data is not None:
+            # the map closes once the last view handed out is gone
+            self.data = None
+            self.connected = False
+            Log.info(f"Closed {self.path}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+RadScan - FFT band scanner
+Hops across the FM band at full capture width and lists the carriers it finds
+"""
+import argparse
+import time
+from functools import lru_cache
+import numpy as np
+from scipy import fft, signal
+from numpy.lib.stride_tricks import sliding_window_view
+
+from radlive import Log, RTLTCPClient, CHANNEL_BANDWIDTH, USABLE_BANDWIDTH
+from radconf import ConfigStore
+
+DEFAULT_SCAN_RATE = 2.4e6
+DEFAULT_FFT_SIZE = 1024
+DEFAULT_AVERAGES = 16
+BAND_START = 87.5e6
+BAND_STOP = 108.0e6
+SETTLE_TIME = 0.05  # seconds of samples dropped after each retune while the tuner settles
+DEFAULT_MAX_AGE = 24 * 3600  # a cached hop older than this is scanned again
+STATION_SPACING = 50e3
+MIN_SNR = 10.0  # dB above the hop's noise floor
+DC_BINS = 2  # bins either side of the center hidden for the dongle's dc spike
+
+
+@lru_cache(maxsize=None)
+def welch_window(fft_size):
+    window = signal.get_window('hann', fft_size).astype(np.float32)
+    return window, float(np.sum(window ** 2))
+
+
+def welch_psd(samples, fft_size=DEFAULT_FFT_SIZE):
+    # averaged periodogram, half overlapping hann frames, dc in the middle
+    window, norm = welch_window(fft_size)
+    frames = sliding_window_view(samples, fft_size)[::fft_size // 2]
+    spectrum = fft.fft(frames * window, axis=-1)
+    power = np.mean(spectrum.real ** 2 + spectrum.imag ** 2, axis=0) / norm
+    return fft.fftshift(power)
+
+
+def find_stations(freqs, power_db, min_snr=MIN_SNR, spacing=STATION_SPACING):
+    # a broadcast carrier is ~200 kHz wide, smoothing over half that leaves one hump per station
+    bin_width = freqs[1] - freqs[0]
+    width = max(1, int(CHANNEL_BANDWIDTH / bin_width))
+    smooth = np.convolve(power_db, np.ones(width) / width, mode='same')
+    floor = float(np.median(smooth))
+    peaks, _ = signal.find_peaks(smooth, height=floor + min_snr,
+                                 distance=max(1, int(1.5 * CHANNEL_BANDWIDTH / bin_width)))
+    # the hump's top wanders with the modulation, its power centroid does not
+    excess = np.maximum(10 ** (power_db / 10) - 10 ** (floor / 10), 0)
+    stations = []
+    for p in peaks:
+        around = slice(max(0, p - width), p + width + 1)
+        weights = excess[around]
+        center = float(np.sum(freqs[around] * weights) / np.sum(weights)) if np.sum(weights) > 0 else freqs[p]
+        stations.append((round(center / spacing) * spacing, float(smooth[p] - floor)))
+    return stations
+
+
+def dongle_key(rtl):
+    tuner = rtl.dongle_info['tuner'] if rtl.dongle_info else 'unknown'
+    return f"{rtl.host}:{rtl.port}/{tuner}"
+
+
+class BandScanner:
+    def __init__(self, rtl, sample_rate=DEFAULT_SCAN_RATE, start=BAND_START, stop=BAND_STOP,
+                 fft_size=DEFAULT_FFT_SIZE, averages=DEFAULT_AVERAGES, gain=None):
+        self.rtl = rtl
+        self.sample_rate = int(sample_rate)
+        self.start = start
+        self.stop = stop
+        self.fft_size = fft_size
+        self.averages = averages
+        self.gain = gain
+        # only the middle of each capture is trusted, hops are spaced by that
+        self.step = USABLE_BANDWIDTH * self.sample_rate
+        count = int(np.ceil((stop - start) / self.step))
+        self.centers = [int(start + (i + 0.5) * self.step) for i in range(count)]
+        self.settle = bytearray(int(SETTLE_TIME * self.sample_rate) * 2)
+        self.offsets = fft.fftshift(fft.fftfreq(fft_size, 1 / self.sample_rate))
+
+    def settings(self, center):
+        # a cached hop is only reused when it was measured the same way
+        return {'center': center, 'sample_rate': self.sample_rate, 'fft_size': self.fft_size,
+                'averages': self.averages, 'gain': self.gain}
+
+    def measure(self, center):
+        if not self.rtl.set_frequency(center):
+            return None
+        self.rtl.flush_commands()
+        self.rtl.drain()
+        if not self.rtl.recv_exact(self.settle):
+            return None
+        samples = self.rtl.read_samples(self.fft_size * (self.averages + 1) // 2)
+        if samples is None:
+            return None
+        power_db = 10 * np.log10(welch_psd(samples, self.fft_size) + 1e-12)
+        middle = self.fft_size // 2
+        power_db[middle - DC_BINS:middle + DC_BINS + 1] = np.median(power_db)
+        return power_db
+
+    def scan_hop(self, center):
+        power_db = self.measure(center)
+        if power_db is None:
+            return None
+        half = self.step / 2
+        stations = [(freq, snr) for freq, snr in find_stations(center + self.offsets, power_db)
+                    if center - half <= freq < center + half and self.start <= freq <= self.stop]
+        return {**self.settings(center), 'time': time.time(),
+                'stations': [[freq / 1e6, round(snr, 1)] for freq, snr in stations]}
+
+    def scan(self, cache=None, max_age=DEFAULT_MAX_AGE, progress=None):
+        # cache is the per dongle entry from config.json, updated in place
+        cache = cache if cache is not None else {}
+        hops = cache.setdefault('hops', {})
+        if not self.rtl.set_sample_rate(self.sample_rate):
+            return None
+        if self.gain is None:
+            self.rtl.enable_hardware_agc()
+        else:
+            self.rtl.disable_hardware_agc()
+            self.rtl.set_gain(self.gain)
+
+        started = time.monotonic()
+        scanned = 0
+        now = time.time()
+        for i, center in enumerate(self.centers):
+            cached = hops.get(str(center))
+            if cached and all(cached.get(k) == v for k, v in self.settings(center).items()) \
+                    and now - cached.get('time', 0) < max_age:
+                continue
+            hop = self.scan_hop(center)
+            if hop is None:
+                Log.error(f"Scan stopped at {center / 1e6:.1f} MHz")
+                return None
+            hops[str(center)] = hop
+            scanned += 1
+            if progress:
+                progress((i + 1) / len(self.centers))
+        # hops from an earlier range or rate would never be reused
+        cache['hops'] = {str(center): hops[str(center)] for center in self.centers if str(center) in hops}
+        hops = cache['hops']
+
+        stations = sorted(
+            (station for center in self.centers for station in hops.get(str(center), {}).get('stations', [])),
+            key=lambda station: station[0])
+        cache['stations'] = stations
+        cache['time'] = now
+        Log.success(f"Found {len(stations)} stations, {scanned}/{len(self.centers)} hops scanned "
+                    f"in {time.monotonic() - started:.1f}s")
+        return stations
+
+
+def load_station_cache(path, key):
+    return ConfigStore(path).load().get('stations', {}).get(key, {})
+
+
+def save_station_cache(path, key, cache):
+    # other settings in the file are kept, the write is atomic
+    store = ConfigStore(path).load()
+    store['stations'] = {**store.get('stations', {}), key: cache}
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan the FM band for stations")
+    parser.add_argument('-H', '--host', default='127.0.0.1')
+    parser.add_argument('-P', '--port', type=int, default=1234)
+    parser.add_argument('-s', '--rate', type=float, default=DEFAULT_SCAN_RATE, help="SDR sample rate in S/s")
+    parser.add_argument('-g', '--gain', type=float, help="manual gain in dB, hardware AGC when omitted")
+    parser.add_argument('--start', type=float, default=BAND_START / 1e6, help="MHz")
+    parser.add_argument('--stop', type=float, default=BAND_STOP / 1e6, help="MHz")
+    parser.add_argument('--averages', type=int, default=DEFAULT_AVERAGES)
+    parser.add_argument('--refresh', action='store_true', help="ignore cached hops")
+    parser.add_argument('--config', default='config.json')
+    args = parser.parse_args()
+
+    rtl = RTLTCPClient(args.host, args.port)
+    if not rtl.connect():
+        return 1
+    try:
+        key = dongle_key(rtl)
+        cache = load_station_cache(args.config, key)
+        scanner = BandScanner(rtl, args.rate, args.start * 1e6, args.stop * 1e6,
+                              averages=args.averages, gain=args.gain)
+        stations = scanner.scan(cache, max_age=0 if args.refresh else DEFAULT_MAX_AGE)
+        if stations is None:
+            return 1
+        save_station_cache(args.config, key, cache)
+    finally:
+        rtl.disconnect()
+
+    for freq, snr in stations:
+        Log.print(f"{freq:8.2f} MHz  {snr:5.1f} dB", 'bright_white')
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())